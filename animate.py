@@ -0,0 +1,43 @@
+"""Export the walkthrough of one query as an animation.
+
+    python animate.py --example koot 0 1 -o walkthrough.gif
+    python animate.py --synthetic grid 400 0 399 -o frames
+
+Every click on Next Step becomes one frame. The format follows the extension of the output, .gif, .mp4 (needs
+ffmpeg) or, without an extension, a directory of numbered PNGs.
+"""
+import argparse
+import sys
+
+from batch import add_graph_arguments, load_graph
+from utils.animation_export import export_animation, ExportError, EXPORT_FPS, EXPORT_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_graph_arguments(parser)
+    parser.add_argument("start", type=int, help="start node")
+    parser.add_argument("target", type=int, help="target node")
+    parser.add_argument("-o", "--output", required=True, help="file.gif, file.mp4 or a directory for PNGs")
+    parser.add_argument("--layout-seed", type=int, default=1, help="seed of the layout, like in the app")
+    parser.add_argument("--fps", type=float, default=EXPORT_FPS, help="steps per second")
+    parser.add_argument("--size", type=int, nargs=2, default=EXPORT_SIZE, metavar=("WIDTH", "HEIGHT"),
+                        help="frame size in pixels")
+    parser.add_argument("--zoom", type=float, default=1, help="zoom on the current node")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all CPUs by default")
+    args = parser.parse_args(argv)
+
+    G = load_graph(args)
+    for node in (args.start, args.target):
+        if node not in G:
+            sys.exit(f"Node {node} is not in the graph")
+    try:
+        frames = export_animation(G, args.start, args.target, args.layout_seed, args.output, args.fps,
+                                  tuple(args.size), args.zoom, args.workers)
+    except ExportError as error:
+        sys.exit(str(error))
+    print(f"Wrote {frames} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
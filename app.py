@@ -3,6 +3,7 @@ from shiny import App, ui
 from modules.dijkstra_info import dijkstra_info
 from modules.graph_ui import graph_ui, graph_ui_server
 from modules.project_information import project_information
+from utils.metrics import METRICS_ENABLED, metrics_endpoint
 
 example_page = ui.page_fluid(
     ui.panel_title("Djikstra Shiny!"),
@@ -31,3 +32,10 @@ def server(input, output, session):
 
 
 app = App(app_ui, server)
+
+if METRICS_ENABLED:
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    shiny_app = app
+    app = Starlette(routes=[Route("/metrics", metrics_endpoint), Mount("/", app=shiny_app)])
@@ -0,0 +1,80 @@
+"""Answer shortest path queries without the app.
+
+    python batch.py --edge-list graph.txt queries.txt -o answers.tsv
+    python batch.py --example koot queries.txt
+
+``queries.txt`` holds one ``start target`` pair per line. Every answer is written as a tab separated
+``start target cost path`` line, the path as space separated node ids.
+"""
+import argparse
+import math
+import sys
+
+from utils.batch_engine import run_batch
+from utils.csr_graph import CSRGraph
+from utils.edge_list_parser import read_query_pairs, EdgeListError
+from utils.graph_generators import generate_from_edge_list_file, generate_koot_example, generate_random_graph
+from utils.graph_utils import format_number
+from utils.query_engines import QUERY_ENGINES
+from utils.synthetic_graphs import geometric_graph, grid_graph, power_law_graph, watts_strogatz_graph
+
+SYNTHETIC_GRAPHS = {
+    "grid": lambda n, seed: grid_graph(math.isqrt(n), math.isqrt(n), seed),
+    "geometric": lambda n, seed: geometric_graph(n, seed=seed),
+    "power_law": lambda n, seed: power_law_graph(n, seed=seed),
+    "watts_strogatz": lambda n, seed: watts_strogatz_graph(n, 4, 0.1, seed),
+}
+
+
+def load_graph(args):
+    if args.edge_list:
+        G = generate_from_edge_list_file(args.edge_list)
+        if isinstance(G, str):
+            sys.exit(G)
+        return G
+    if args.random:
+        n, k, p = args.random
+        return CSRGraph.from_networkx(generate_random_graph(int(n), int(k), float(p), args.seed))
+    if args.synthetic:
+        kind, n = args.synthetic
+        if kind not in SYNTHETIC_GRAPHS:
+            sys.exit(f"Unknown synthetic graph {kind}, choose one of {', '.join(SYNTHETIC_GRAPHS)}")
+        return SYNTHETIC_GRAPHS[kind](int(n), args.seed)
+    return CSRGraph.from_networkx(generate_koot_example())
+
+
+def add_graph_arguments(parser):
+    graph = parser.add_mutually_exclusive_group(required=True)
+    graph.add_argument("--edge-list", metavar="FILE", help="whitespace separated 'u v weight' edge list")
+    graph.add_argument("--example", choices=["koot"], help="built in example graph")
+    graph.add_argument("--random", nargs=3, metavar=("N", "K", "P"), help="connected Watts-Strogatz graph")
+    graph.add_argument("--synthetic", nargs=2, metavar=("KIND", "N"),
+                       help=f"seeded synthetic graph of about N nodes, KIND is one of {', '.join(SYNTHETIC_GRAPHS)}")
+    parser.add_argument("--seed", type=int, default=0, help="seed of --random and --synthetic graphs")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_graph_arguments(parser)
+    parser.add_argument("queries", help="file with one 'start target' pair per line, - for stdin")
+    parser.add_argument("-o", "--output", help="answer file, stdout by default")
+    parser.add_argument("--engine", choices=sorted(QUERY_ENGINES), default="tree")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all CPUs by default")
+    args = parser.parse_args(argv)
+
+    G = load_graph(args)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        answers = run_batch(G, read_query_pairs(sys.stdin if args.queries == "-" else args.queries),
+                            args.engine, args.workers)
+        for start, target, cost, path in answers:
+            output.write(f"{start}\t{target}\t{format_number(cost)}\t{' '.join(map(str, path))}\n")
+    except (EdgeListError, KeyError) as error:
+        sys.exit(f"Queries invalid: {error}")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
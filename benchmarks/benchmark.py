@@ -0,0 +1,282 @@
+"""Time and peak memory of the graph generators, the solver, the step engine and the plotting.
+
+    python -m benchmarks.benchmark                      # all cases, 10 to 10^6 nodes
+    python -m benchmarks.benchmark --sizes 10 1000 --repeat 5 --output before.json
+    python -m benchmarks.benchmark --compare before.json after.json
+
+Every case runs on the same seeded graphs, results are written as JSON (benchmarks/results/<revision>.json
+by default) so two revisions can be compared. Cases skip sizes above their ``max_size``, a full step walk or a
+spring layout of a million nodes would take hours. With the default sizes a run takes about half an hour.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+from shiny import reactive  # noqa: E402
+
+from modules.graph_ui import handle_next_step, reset_distances  # noqa: E402
+from modules.session_state import SessionState  # noqa: E402
+from utils.csr_graph import CSRGraph  # noqa: E402
+from utils.edge_list_editor import EdgeListEditor  # noqa: E402
+from utils.graph_generators import generate_random_graph, generate_from_edge_list  # noqa: E402
+from utils.graph_utils import compute_layout, dijkstra_solution, layout_cache, plot_graph  # noqa: E402
+from utils.query_engines import ShortestPathTree, tree_cache  # noqa: E402
+from utils.synthetic_graphs import grid_graph, geometric_graph, power_law_graph  # noqa: E402
+
+SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+SEED = 42
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+
+class WalkInput:
+    """Stands in for the Shiny inputs the step engine reads."""
+
+    def __init__(self, start, target):
+        self._start, self._target = start, target
+
+    def start_node(self):
+        return self._start
+
+    def target_node(self):
+        return self._target
+
+    def query_engine(self):
+        return "tree"
+
+
+def synthetic_graph(n, degree=4, seed=SEED):
+    """Connected graph of a ring plus random chords, built directly from arrays so it is cheap at any size."""
+    rng = np.random.default_rng(seed)
+    ring = np.arange(n)
+    chords = n * (degree - 2) // 2
+    u = np.concatenate([ring, rng.integers(0, n, chords)])
+    v = np.concatenate([(ring + 1) % n, rng.integers(0, n, chords)])
+    w = rng.integers(1, 100, len(u))
+    return CSRGraph.from_edges(u, v, w)
+
+
+def edge_list_text(n, seed=SEED):
+    u, v, w = synthetic_graph(n, seed=seed).edge_array()
+    return "\n".join(f"{a} {b} {c}" for a, b, c in zip(u.tolist(), v.tolist(), w.tolist()))
+
+
+def setup_random_graph(n, k=4, p=0.1):
+    return lambda: generate_random_graph(n, k, p, seed=SEED)
+
+
+def setup_synthetic(generator):
+    return lambda n: lambda: generator(n, seed=SEED)
+
+
+def setup_edge_list(n):
+    text = edge_list_text(n)
+    return lambda: generate_from_edge_list(text)
+
+
+def setup_edge_list_edit(edit):
+    """Times the edit of one line of an edge list in the editor of the text area, compare with
+    generate_from_edge_list, which parses the whole list again."""
+    def setup(n):
+        text = edge_list_text(n)
+        editor = EdgeListEditor()
+        editor.update(text)
+        # Every run is an edit, alternately making the change and taking it back
+        texts = itertools.cycle(["\n".join(edit(text.splitlines(), n)), text])
+        return lambda: editor.update(next(texts))
+    return setup
+
+
+def edit_weight(lines, n):
+    u, v, w = lines[len(lines) // 2].split()
+    return lines[:len(lines) // 2] + [f"{u} {v} {int(w) + 1}"] + lines[len(lines) // 2 + 1:]
+
+
+def edit_endpoint(lines, n):
+    u, v, w = lines[len(lines) // 2].split()
+    return lines[:len(lines) // 2] + [f"{u} {(int(v) + 1) % n} {w}"] + lines[len(lines) // 2 + 1:]
+
+
+def edit_append(lines, n):
+    return lines + [f"0 {n // 2} 1"]
+
+
+def setup_solution(n):
+    G = synthetic_graph(n)
+
+    def run():
+        # Every repetition has to solve again instead of reading the tree of the previous one
+        tree_cache.clear()
+        return dijkstra_solution(G, 0, n // 2)
+    return run
+
+
+def setup_tree_repair(n):
+    G = synthetic_graph(n)
+    tree = ShortestPathTree(G, 0)
+    # Make the edge above the target three times slower, the "what if this road gets slower" question
+    target = n // 2
+    parent = int(tree.predecessors[target])
+    u, v, w = G.edge_array()
+    w = w.copy()
+    w[(np.minimum(u, v) == min(parent, target)) & (np.maximum(u, v) == max(parent, target))] *= 3
+    edited = CSRGraph.from_edges(G.node_ids[u], G.node_ids[v], w, G.node_ids)
+
+    def run():
+        return ShortestPathTree(edited, 0, (G, tree))
+    return run
+
+
+def setup_step_walk(n):
+    G = synthetic_graph(n)
+
+    def run():
+        with reactive.isolate():
+            state = SessionState()
+            state.set_graph(G)
+            reset_distances(state)
+            walk_input = WalkInput(0, n // 2)
+            while state.step_counter.get() != 3:
+                handle_next_step(state, walk_input)
+    return run
+
+
+def setup_layout(n):
+    G = synthetic_graph(n)
+
+    def run():
+        layout_cache.clear()
+        compute_layout(G, SEED)
+    return run
+
+
+def setup_plot(n):
+    G = synthetic_graph(n)
+
+    def run():
+        layout_cache.clear()
+        plot_graph(G, 0, n // 2, seed=SEED)
+        figure = plt.gcf()
+        figure.savefig(io.BytesIO(), format="png")
+        plt.close(figure)
+    return run
+
+
+# name: (setup(n) returning the function to time, largest size the case runs at)
+CASES = {
+    "generate_random_graph": (setup_random_graph, 1_000_000),
+    "generate_random_graph_dense": (lambda n: setup_random_graph(n, k=10, p=0.5), 100_000),
+    "grid_graph": (setup_synthetic(lambda n, seed: grid_graph(int(np.sqrt(n)), int(np.sqrt(n)), seed)), 1_000_000),
+    "geometric_graph": (setup_synthetic(geometric_graph), 1_000_000),
+    "power_law_graph": (setup_synthetic(power_law_graph), 1_000_000),
+    "generate_from_edge_list": (setup_edge_list, 1_000_000),
+    "edit_edge_list_weight": (setup_edge_list_edit(edit_weight), 1_000_000),
+    "edit_edge_list_endpoint": (setup_edge_list_edit(edit_endpoint), 1_000_000),
+    "edit_edge_list_append": (setup_edge_list_edit(edit_append), 1_000_000),
+    "dijkstra_solution": (setup_solution, 1_000_000),
+    "repair_shortest_path_tree": (setup_tree_repair, 1_000_000),
+    "handle_next_step_walk": (setup_step_walk, 10_000),
+    "compute_layout": (setup_layout, 100_000),
+    "plot_graph": (setup_plot, 100_000),
+}
+
+
+def measure(run, repeat):
+    """Median time of ``repeat`` runs and the peak memory of one more. tracemalloc slows down every allocation,
+    so it only traces the extra run and the timed ones run without it."""
+    seconds = []
+    for _ in range(repeat):
+        random.seed(SEED)
+        began = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - began)
+
+    random.seed(SEED)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "median_seconds": statistics.median(seconds), "peak_bytes": peak}
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(cases, sizes, repeat):
+    results = []
+    for name in cases:
+        setup, max_size = CASES[name]
+        # One untimed run so imports and first call caches do not end up in the smallest size
+        setup(min(sizes))()
+        for n in sizes:
+            if n > max_size:
+                continue
+            random.seed(SEED)
+            result = {"case": name, "n": n, **measure(setup(n), repeat)}
+            print(f"{name:30} n={n:<9} {result['median_seconds']:10.4f} s {result['peak_bytes'] / 2 ** 20:10.1f} MiB",
+                  flush=True)
+            results.append(result)
+    return results
+
+
+def compare(old_path, new_path):
+    with open(old_path) as file:
+        old = {(r["case"], r["n"]): r for r in json.load(file)["results"]}
+    with open(new_path) as file:
+        new = {(r["case"], r["n"]): r for r in json.load(file)["results"]}
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        print(f"{key[0]:30} n={key[1]:<9} time x{after['median_seconds'] / before['median_seconds']:6.2f}"
+              f"   memory x{after['peak_bytes'] / max(before['peak_bytes'], 1):6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="result file, benchmarks/results/<revision>.json by default")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": run_benchmarks(args.cases, sorted(args.sizes), args.repeat),
+    }
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
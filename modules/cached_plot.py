@@ -0,0 +1,38 @@
+import matplotlib.pyplot as plt
+from shiny import render
+from shiny.session import get_current_session
+
+from utils.frame_cache import frame_cache, render_frame
+
+
+def frame_size(session, output_id):
+    """``(width, height, pixelratio)`` the browser reported for the plot output ``output_id``."""
+    return (session.clientdata.output_width(output_id), session.clientdata.output_height(output_id),
+            session.clientdata.pixelratio())
+
+
+class cached_plot(render.plot):
+    """``render.plot`` that keeps every rendered frame in ``frame_cache``.
+
+    The decorated function returns ``(key, draw)`` or None. ``key`` has to tell apart everything the frame shows
+    and ``draw()`` returns the matplotlib figure, it is only called when the frame is not cached yet.
+    """
+
+    async def render(self):
+        # Read the size first, like render.plot, so resizing the output renders again
+        size = frame_size(get_current_session(), self.output_id)
+        frame = await self.fn()
+        if frame is None:
+            return None
+        key, draw = frame
+        key = (key, size)
+        image = frame_cache.get(key)
+        if image is None:
+            figure = draw()
+            if figure is None:
+                return None
+            image = frame_cache.put(key, render_frame(figure, *size, alt=self.alt))
+            if figure.canvas.manager is not None:
+                # Figures of pyplot stay open until they are closed
+                plt.close(figure)
+        return image
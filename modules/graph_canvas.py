@@ -0,0 +1,140 @@
+from shiny import ui
+
+graph_canvas_script = """
+(function () {
+    const SVG_NS = "http://www.w3.org/2000/svg";
+    const scenes = {};
+
+    function create(parent, name, attributes, text) {
+        const element = document.createElementNS(SVG_NS, name);
+        for (const [key, value] of Object.entries(attributes)) {
+            element.setAttribute(key, value);
+        }
+        if (text !== undefined) {
+            element.textContent = text;
+        }
+        parent.appendChild(element);
+        return element;
+    }
+
+    function bounds(values) {
+        // A loop instead of Math.min(...values), spreading a large graph exceeds the argument limit
+        let low = Infinity, high = -Infinity;
+        for (const value of values) {
+            if (value < low) low = value;
+            if (value > high) high = value;
+        }
+        return [low, high];
+    }
+
+    // Nodes and edges the level of detail leaves out are only created once they are styled, like the start,
+    // target and current node and the highlighted edges, and removed again when they go back to normal.
+    function node(scene, i) {
+        if (!scene.nodes.has(i)) {
+            scene.nodes.set(i, create(scene.nodeLayer, "circle", {cx: scene.xs[i], cy: scene.ys[i],
+                                                                  r: scene.radius, fill: "#1f77b4"}));
+        }
+        return scene.nodes.get(i);
+    }
+
+    function edge(scene, i) {
+        if (!scene.edges.has(i)) {
+            const u = scene.u[i], v = scene.v[i];
+            scene.edges.set(i, create(scene.edgeLayer, "line", {x1: scene.xs[u], y1: scene.ys[u],
+                                                                x2: scene.xs[v], y2: scene.ys[v]}));
+        }
+        return scene.edges.get(i);
+    }
+
+    function setText(scene, texts, i, dy, text) {
+        if (!texts.has(i)) {
+            if (!text) {
+                return;
+            }
+            texts.set(i, create(scene.textLayer, "text", {x: scene.xs[i], y: scene.ys[i] + dy}));
+        }
+        texts.get(i).textContent = text;
+    }
+
+    Shiny.addCustomMessageHandler("graph_scene", function (message) {
+        const svg = document.getElementById(message.id);
+        svg.replaceChildren();
+        const xs = message.nodes.x, ys = message.nodes.y.map(y => -y);
+        const [lowX, highX] = bounds(xs), [lowY, highY] = bounds(ys);
+        const minX = lowX - 0.2, maxX = highX + 0.2;
+        const minY = lowY - 0.2, maxY = highY + 0.2;
+        svg.setAttribute("viewBox", `${minX} ${minY} ${maxX - minX} ${maxY - minY}`);
+
+        const edgeLayer = create(svg, "g", {"stroke": "black", "stroke-width": message.edges.width});
+        const weightLayer = create(svg, "g", {"font-size": 0.045, "text-anchor": "middle",
+                                              "dominant-baseline": "central"});
+        const nodeLayer = create(svg, "g", {});
+        const textLayer = create(svg, "g", {"font-size": 0.05, "text-anchor": "middle",
+                                            "dominant-baseline": "central"});
+        const scene = {
+            xs: xs, ys: ys, u: message.edges.u, v: message.edges.v, radius: message.nodes.radius,
+            drawnNodes: new Set(message.nodes.drawn), drawnEdges: new Set(message.edges.drawn),
+            nodes: new Map(), edges: new Map(), names: new Map(), labels: new Map(), costs: new Map(),
+            edgeLayer: edgeLayer, nodeLayer: nodeLayer, textLayer: textLayer, weights: weightLayer,
+        };
+
+        message.edges.drawn.forEach(i => edge(scene, i));
+        message.edges.labelled.forEach((i, k) => {
+            const u = scene.u[i], v = scene.v[i];
+            create(weightLayer, "text", {x: (xs[u] + xs[v]) / 2, y: (ys[u] + ys[v]) / 2, fill: "black",
+                                         stroke: "white", "stroke-width": 0.015, "paint-order": "stroke"},
+                   message.edges.weights[k]);
+        });
+        message.nodes.drawn.forEach(i => node(scene, i));
+        scenes[message.id] = scene;
+    });
+
+    Shiny.addCustomMessageHandler("graph_style", function (message) {
+        const scene = scenes[message.id];
+        if (!scene) {
+            return;
+        }
+        if (message.nodes) {
+            message.nodes[0].forEach((i, k) => {
+                const color = message.nodes[1][k];
+                if (color === "#1f77b4" && !scene.drawnNodes.has(i) && scene.nodes.has(i)) {
+                    scene.nodes.get(i).remove();
+                    scene.nodes.delete(i);
+                } else if (color !== "#1f77b4" || scene.drawnNodes.has(i)) {
+                    node(scene, i).setAttribute("fill", color);
+                }
+            });
+        }
+        if (message.edges) {
+            message.edges[0].forEach((i, k) => {
+                const highlighted = message.edges[1][k];
+                if (!highlighted && !scene.drawnEdges.has(i) && scene.edges.has(i)) {
+                    scene.edges.get(i).remove();
+                    scene.edges.delete(i);
+                } else if (highlighted || scene.drawnEdges.has(i)) {
+                    edge(scene, i).setAttribute("stroke", highlighted ? "#d62728" : "black");
+                }
+            });
+        }
+        if (message.names) {
+            message.names[0].forEach((i, k) => setText(scene, scene.names, i, 0, message.names[1][k]));
+        }
+        if (message.labels) {
+            message.labels[0].forEach((i, k) => setText(scene, scene.labels, i, 0.1, message.labels[1][k]));
+        }
+        if (message.costs) {
+            message.costs[0].forEach((i, k) => setText(scene, scene.costs, i, -0.1, message.costs[1][k]));
+        }
+        if (message.weights !== undefined) {
+            scene.weights.setAttribute("visibility", message.weights ? "visible" : "hidden");
+        }
+    });
+})();
+"""
+
+
+def graph_canvas(output_id):
+    return ui.TagList(
+        ui.tags.svg(id=output_id, width="100%", height="400px", preserveAspectRatio="xMidYMid meet"),
+        ui.tags.script(graph_canvas_script),
+    )
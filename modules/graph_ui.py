@@ -1,33 +1,58 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from operator import contains
 
-import networkx as nx
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from htmltools import TagList
 from shiny import ui, render, reactive
 from shiny.types import FileInfo
 
+from modules.cached_plot import cached_plot, frame_size
 from modules.djikstra_explanation import djikstra_explanation
+from modules.graph_canvas import graph_canvas
+from modules.session_state import SessionState, session_registry
 from modules.solution_quiz import render_solution_quiz
 from modules.tutorial_modal import tutorial_modal, tutorial_modal_server
-from utils.graph_generators import generate_random_graph, generate_koot_example, generate_from_edge_list
-from utils.graph_utils import plot_graph, dijkstra_solution
+from utils.animation_export import animation_gif, EXPORT_SIZE
+from utils.contraction_hierarchy import contraction_hierarchy
+from utils.csr_graph import CSRGraph
+from utils.distance_table import DistanceTable
+from utils.dijkstra_trace import build_trace, EVENT_RELAX, EVENT_SETTLE, FRAME_SELECT
+from utils.frame_cache import frame_cache, frame_key, render_frame
+from utils.graph_figure import update_graph_figure
+from utils.graph_store import file_key, graph_store, parameters_key
+from utils.graph_scene import SceneStream
+from utils.graph_generators import generate_random_graph, generate_koot_example, generate_from_edge_list, \
+    generate_from_edge_list_file
+from utils.graph_utils import compute_layout, format_number, plot_graph
+from utils.query_engines import shortest_path_query, shortest_path_tree, path_cost, PathResult
 from utils.icons import warning as warning_icon
-
-distances_df = reactive.Value(pd.DataFrame())
-graph = reactive.Value(nx.Graph())
-seed = reactive.Value(1)
-step_counter = reactive.Value(0)
-step_explanation = reactive.Value(TagList("Here will be the explanations of every step"))
-current_node = reactive.Value(None)
-current_edges = reactive.Value([])
-distance = reactive.Value(0)
-nodes_visited = reactive.Value([])
-state_history = reactive.Value([])
-invalid_edge_list = reactive.Value(False)
-solution = reactive.Value()
-start_node_error = reactive.Value(False)
-target_node_error = reactive.Value(False)
+from utils.metrics import timed
+
+# Keep one matplotlib figure per graph and layout and only restyle its artists on every step
+# instead of drawing the whole graph again.
+INCREMENTAL_RENDERING = True
+# The frontier under the visited nodes lists at most this many nodes.
+FRONTIER_DISPLAY_LIMIT = 10
+# Graphs are built this many seconds after the last change of their inputs, so dragging a slider only
+# builds the graph it stops at.
+GRAPH_BUILD_DEBOUNCE = 0.3
+# How often, in seconds, every session checks the registry for sessions that have been idle too long.
+EVICTION_INTERVAL = 60
+# After an edit of the graph of a finished walkthrough, at most this many of the nodes whose distance or
+# previous node changed are marked in the distances table.
+REPAIR_HIGHLIGHT_LIMIT = 1000
+# Processes that render the frames of one animation download. The app renders in its own thread instead of
+# starting a pool per click, the graph build threads bound how many downloads run at once.
+DOWNLOAD_WORKERS = 1
+
+
+graph_build_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="graph-build")
+# One thread renders the frame behind the Next Step button of every session, each with its own figure.
+frame_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-prefetch")
 
 
 class GraphType(Enum):
@@ -49,10 +74,20 @@ def graph_ui():
                 ui.input_numeric("target_node", ui.span("Target Node", ui.output_ui("target_node_error_message")),
                                  value=1, min=0),
                 ui.input_numeric("layout_seed", "Layout Seed", value=1, min=0),
+                ui.panel_conditional("!input.vector_rendering",
+                                     ui.input_slider("zoom", "Zoom on the current node", min=1, max=20, value=1)),
+                ui.input_select("query_engine", "Solver",
+                                {"tree": "Dijkstra", "dijkstra": "Dijkstra, stop at the target",
+                                 "bidirectional": "Bidirectional Dijkstra",
+                                 "alt": "A* with landmarks (ALT)", "ch": "Contraction hierarchy"}),
+                ui.input_numeric("jump_step", "Jump to Step", value=1, min=1),
+                ui.input_switch("vector_rendering", "Draw the graph in the browser", value=False),
+                ui.download_button("download_animation", "Download the walkthrough as GIF"),
             ),
             ui.output_ui("explain"),
             ui.output_ui("progress_bar"),
-            ui.output_plot("graph_plot"),
+            ui.panel_conditional("!input.vector_rendering", ui.output_plot("graph_plot")),
+            ui.panel_conditional("input.vector_rendering", graph_canvas("graph_canvas")),
             ui.row(
                 ui.column(6, ui.output_ui("render_solution_quiz_ui"), distances_ui()),
                 ui.column(6, visited_nodes_ui(), algorithm_explanation_ui())
@@ -99,110 +134,242 @@ def algorithm_explanation_ui():
     )
 
 
-def save_state():
-    state = {
-        "distances_df": distances_df.get().copy(),
-        "step_counter": step_counter.get(),
-        "nodes_visited": nodes_visited.get().copy(),
-        "current_edges": current_edges.get().copy(),
-        "current_node": current_node.get(),
-        "step_explanation": step_explanation.get()
+def snapshot_state(state: SessionState):
+    return {
+        "cost": state.distances.get().cost,
+        "previous": state.distances.get().previous,
+        "visited": state.distances.get().visited,
+        "step_counter": state.step_counter.get(),
+        "nodes_visited": state.nodes_visited.get(),
+        "current_edges": state.current_edges.get(),
+        "current_node": state.current_node.get(),
+        "step_explanation": state.step_explanation.get(),
+        "trace_cursor": state.trace_cursor.get()
     }
-    state_history.get().append(state)
 
 
-def restore_state():
-    if state_history.get():
-        state = state_history.get().pop()
-        distances_df.set(state["distances_df"])
-        step_counter.set(state["step_counter"])
-        nodes_visited.set(state["nodes_visited"])
-        current_edges.set(state["current_edges"])
-        current_node.set(state["current_node"])
-        step_explanation.set(state["step_explanation"])
+def save_state(state: SessionState, touched=None):
+    """Remember the state before a step, ``touched`` are the indices of the table rows the step changes. Without
+    them the whole table is copied."""
+    state.state_history.get().push(snapshot_state(state), touched)
+    state.enforce_budget()
+
+
+def restore_state(state: SessionState):
+    if state.state_history.get():
+        snapshot = state.state_history.get().pop(snapshot_state(state))
+        state.distances.set(DistanceTable(snapshot["cost"], snapshot["previous"], snapshot["visited"]))
+        state.step_counter.set(snapshot["step_counter"])
+        state.nodes_visited.set(snapshot["nodes_visited"])
+        state.current_edges.set(snapshot["current_edges"])
+        state.current_node.set(snapshot["current_node"])
+        state.step_explanation.set(snapshot["step_explanation"])
+        state.trace_cursor.set(snapshot["trace_cursor"])
 
 
-def reset_df():
-    G = graph.get()
+def reset_distances(state: SessionState):
+    G = state.graph.get()
     if G:
-        nodes, index_name = get_graph_nodes_and_index_name(G)
-        distance_matrix = pd.DataFrame(index=nodes, columns=["Cost", "Previous"])
-        distance_matrix["Cost"] = float('inf')
-
-        distance_matrix.index.name = index_name
-        distance_matrix.reset_index(inplace=True)
-        distances_df.set(distance_matrix)
-        step_counter.set(0)
-        nodes_visited.set([])
-        current_edges.set([])
-        current_node.set(None)
-        solution.set(None)
-        step_explanation.set(TagList("Here will be the explanations of every step"))
-
-
-def get_graph_nodes_and_index_name(G):
-    if "label" in G.nodes[0]:
-        nodes = dict(sorted(nx.get_node_attributes(G, "label").items())).values()
-        index_name = "Cities"
+        state.distances.set(DistanceTable.empty(len(G)))
+        state.step_counter.set(0)
+        state.nodes_visited.set([])
+        state.current_edges.set([])
+        state.current_node.set(None)
+        state.solution.set(None)
+        state.trace.set(None)
+        state.trace_cursor.set(0)
+        state.state_history.set(state.new_history())
+        state.step_explanation.set(TagList("Here will be the explanations of every step"))
+        state.repaired_nodes.set(None)
+        state.distances_graph = G
+
+
+def repair_solution(state: SessionState, input, G):
+    """Keep a finished walkthrough when only edges of its graph were edited, for "what if" questions.
+
+    The shortest path tree of the start node is repaired instead of computed again. The distances table then
+    shows the whole tree, once it does only the nodes whose distance or previous node changed are updated.
+    Returns False when the walkthrough has to start over.
+    """
+    previous_graph = state.distances_graph
+    start, target = input.start_node(), input.target_node()
+    if input.query_engine() != "tree" or previous_graph is None or previous_graph is G or \
+            state.solution.get() is None or state.step_counter.get() not in (3, 4) or start not in G or \
+            target not in G or not np.array_equal(previous_graph.node_ids, G.node_ids):
+        return False
+
+    tree = shortest_path_tree(G, G.index_of(start), previous_graph)
+    path = tree.path_to(G.index_of(target))
+    if path is None:
+        return False
+    repaired = tree.repaired_from == previous_graph.fingerprint()
+    if repaired and state.repaired_nodes.get() is not None:
+        changed = tree.changed
+        distances = state.distances.get().copy()
+        distances.cost[changed] = tree.distances[changed]
+        distances.previous[changed] = np.maximum(tree.predecessors[changed], -1)
+        distances.visited[changed] = np.isfinite(tree.distances[changed])
     else:
-        nodes = [str(node) for node in G.nodes]
-        index_name = "Node"
-    return nodes, index_name
+        distances = DistanceTable(tree.distances.copy(), np.maximum(tree.predecessors, -1).astype(np.int64),
+                                  np.isfinite(tree.distances))
+        distances.previous[tree.source] = tree.source
+        changed = tree.changed if repaired else np.flatnonzero(distances.cost != state.distances.get().cost)
+
+    path = [G.node_at(node) for node in path]
+    state.distances_graph = G
+    state.distances.set(distances)
+    state.repaired_nodes.set(changed)
+    state.solution.set(PathResult(path, tree.distances[G.index_of(target)].item(), len(changed)))
+    # The trace and the history of the walkthrough belong to the graph before the edit
+    state.trace.set(None)
+    state.trace_cursor.set(0)
+    state.state_history.set(state.new_history())
+    state.current_node.set(target)
+    if state.step_counter.get() == 4:
+        show_solution(state, path)
+    state.step_explanation.set(TagList(
+        f"The edit changed the distance or the previous node of {len(changed)} nodes, they are marked yellow in "
+        f"the table. The shortest path to {target} now costs {format_number(state.solution.get().cost)}."))
+    return True
 
 
 def graph_ui_server(input, output, session):
+    state = SessionState()
+    state.scene_stream = SceneStream("graph_canvas")
+    session_registry.register(session, state)
+    session.on_flush(lambda: session_registry.touch(session.id), once=False)
+
+    @reactive.Effect
+    def evict_idle_sessions():
+        reactive.invalidate_later(EVICTION_INTERVAL)
+        session_registry.evict_idle()
+
     @output
     @render.ui
     def render_solution_quiz_ui():
-        if step_counter.get() == 3:
+        if state.step_counter.get() == 3:
             return render_solution_quiz()
 
     @output
     @render.ui
+    @timed("render_progress_bar")
     def progress_bar():
-        return create_progress_bar()
+        return create_progress_bar(state)
 
     @output
     @render.ui
+    @timed("render_explain")
     def explain():
-        return create_explanation_ui()
+        return create_explanation_ui(state)
 
     @output
     @render.ui
-    @reactive.event(nodes_visited)
+    @reactive.event(state.nodes_visited, state.distances, state.solution)
+    @timed("render_visited_nodes")
     def visited_nodes():
-        nodes = ", ".join(
-            [str(int(node)) for node in nodes_visited.get()]) if nodes_visited.get() else "No nodes visited yet"
-        return TagList(nodes)
+        nodes = ", ".join([str(int(node)) for node in state.nodes_visited.get()]) \
+            if state.nodes_visited.get() else "No nodes visited yet"
+        nodes = TagList(nodes, create_frontier_ui(state))
+        result = state.solution.get()
+        if result is None:
+            return TagList(nodes)
+        if state.repaired_nodes.get() is not None:
+            return TagList(nodes, ui.br(), f"Repairing the shortest path tree after the edit changed "
+                                           f"{result.settled} of {len(state.graph.get())} nodes.")
+        if result.settled == 0:
+            return TagList(nodes, ui.br(), "The shortest path was read from the cached shortest path tree "
+                                           "of the start node.")
+        return TagList(nodes, ui.br(), f"The {input.query_engine()} solver settled {result.settled} "
+                                       f"of {len(state.graph.get())} nodes to find the shortest path.")
 
     @reactive.Effect
     @reactive.event(input.prev_step)
     def prev_step():
-        restore_state()
+        restore_state(state)
 
     @reactive.Effect
     @reactive.event(input.next_step)
     def next_step():
-        handle_next_step(input)
+        handle_next_step(state, input)
+
+    @reactive.Effect
+    @reactive.event(input.jump_step, ignore_init=True)
+    def jump_step():
+        if input.jump_step() is not None:
+            jump_to_step(state, input, input.jump_step())
+
+    @render.download_button(filename="dijkstra_walkthrough.gif", media_type="image/gif")
+    async def download_animation():
+        G = state.graph.get()
+        if not G or not check_query_nodes(state, input, G):
+            return
+        loop = asyncio.get_running_loop()
+        yield await loop.run_in_executor(graph_build_executor, animation_gif, G, input.start_node(),
+                                         input.target_node(), input.layout_seed(), EXPORT_SIZE, input.zoom(),
+                                         DOWNLOAD_WORKERS)
+
+    @reactive.extended_task
+    async def graph_task(request, seed, start, cancelled, previous):
+        # Waiting first is the debounce, a newer input cancels this task before it builds anything
+        await asyncio.sleep(GRAPH_BUILD_DEBOUNCE)
+        loop = asyncio.get_running_loop()
+        return request, await loop.run_in_executor(graph_build_executor, build_graph, request, seed, start, cancelled,
+                                                   previous)
 
     @reactive.Effect
     def update_graph():
-        update_graph_based_on_selection(input)
+        request = graph_request(state, input)
+        if request is None:
+            return
+        with reactive.isolate():
+            seed = input.layout_seed()
+            # Only the Dijkstra solver answers from the shortest path tree of the start node
+            start = input.start_node() if input.query_engine() == "tree" else None
+            # The layout of an edited edge list starts from the one shown now
+            previous = (state.graph.get(), seed)
+        if state.graph_job is not None:
+            state.graph_job.set()
+        state.graph_job = threading.Event()
+        graph_task.cancel()
+        graph_task.invoke(request, seed, start, state.graph_job, previous)
+
+    @reactive.Effect
+    def use_built_graph():
+        _, result = graph_task.result()
+        if result is None:
+            return
+        if isinstance(result, str):
+            state.invalid_edge_list.set(True)
+            state.step_explanation.set(TagList(result))
+        else:
+            state.invalid_edge_list.set(False)
+            state.set_graph(result)
 
     @output
     @render.data_frame
-    @reactive.event(distances_df, step_counter, input.start_node, input.target_node)
+    @reactive.event(state.distances, state.step_counter, input.start_node, input.target_node)
+    @timed("render_display_distances")
     def display_distances():
-        return render_distances(input)
+        return render_distances(state, input)
 
     @reactive.Effect
-    @reactive.event(input.target_node, input.start_node)
+    @reactive.event(state.graph, input.query_engine)
+    def prepare_query_engine():
+        # Start preprocessing as soon as the graph is loaded so the first query does not have to wait for it
+        if input.query_engine() == "ch" and len(state.graph.get()) > 0:
+            contraction_hierarchy(state.graph.get())
+
+    @reactive.Effect
+    @reactive.event(input.target_node, input.start_node, input.query_engine)
     def reset_djikstra():
-        reset_df()
+        reset_distances(state)
 
     @reactive.Effect
     def initialize_distances():
-        reset_df()
+        G = state.graph.get()
+        with reactive.isolate():
+            if not repair_solution(state, input, G):
+                reset_distances(state)
 
     @output
     @render.ui
@@ -212,32 +379,66 @@ def graph_ui_server(input, output, session):
     @output
     @render.ui
     def start_node_error_message():
-        return ui.tooltip(warning_icon, "Your input is invalid") if start_node_error.get() else None
+        return ui.tooltip(warning_icon, "Your input is invalid") if state.start_node_error.get() else None
 
     @output
     @render.ui
     def target_node_error_message():
-        return ui.tooltip(warning_icon, "Your input is invalid") if target_node_error.get() else None
+        return ui.tooltip(warning_icon, "Your input is invalid") if state.target_node_error.get() else None
 
     @output
     @render.ui
     def edge_list_error_message():
-        return ui.tooltip(warning_icon, "Your input is invalid") if invalid_edge_list.get() else None
+        return ui.tooltip(warning_icon, "Your input is invalid") if state.invalid_edge_list.get() else None
         # return ui.p("Your Input edge list is not Valid!",
-        #             style="border: 3px solid red;") if invalid_edge_list.get() else None,
+        #             style="border: 3px solid red;") if state.invalid_edge_list.get() else None,
 
     @output
-    @render.plot
-    @reactive.event(input.selectize_graph, graph, input.layout_seed, input.start_node, input.target_node, current_node,
-                    current_edges)
+    @cached_plot
+    @reactive.event(input.selectize_graph, state.graph, input.layout_seed, input.start_node, input.target_node,
+                    state.current_node, state.current_edges, input.vector_rendering, input.zoom)
+    @timed("render_graph_plot")
     def graph_plot():
-        if step_counter.get() == 3:
+        if input.vector_rendering() or not state.graph.get():
+            return None
+
+        if state.step_counter.get() == 3:
             final_step = True
         else:
             final_step = False
 
-        plot_graph(graph.get(), input.start_node(), input.target_node(), input.layout_seed(), distances_df.get(),
-                   current_node.get(), final_step)
+        def draw():
+            if INCREMENTAL_RENDERING:
+                state.graph_figure = update_graph_figure(state.graph_figure, state.graph.get(), input.start_node(),
+                                                         input.target_node(), input.layout_seed(),
+                                                         state.distances.get().cost, state.current_node.get(),
+                                                         state.current_edges.get(), final_step=final_step,
+                                                         zoom=input.zoom())
+                return state.graph_figure.figure if state.graph_figure else None
+
+            plot_graph(state.graph.get(), input.start_node(), input.target_node(), input.layout_seed(),
+                       state.distances.get().cost, state.current_node.get(), state.current_edges.get(),
+                       final_step=final_step, zoom=input.zoom())
+            return plt.gcf()
+
+        prefetch_next_frame(state, input, frame_size(session, "graph_plot"))
+        return frame_key(state.graph.get(), input.layout_seed(), step_index(state), input.start_node(),
+                         input.target_node(), input.zoom()), draw
+
+    @reactive.Effect
+    @reactive.event(state.graph, input.layout_seed, input.start_node, input.target_node, state.current_node,
+                    state.current_edges, state.distances, state.step_counter, input.vector_rendering)
+    @timed("render_graph_scene")
+    async def graph_scene():
+        if not input.vector_rendering():
+            state.scene_stream.reset()
+            return
+
+        messages = state.scene_stream.update(state.graph.get(), input.layout_seed(), input.start_node(),
+                                             input.target_node(), state.distances.get().cost, state.current_node.get(),
+                                             state.current_edges.get(), final_step=state.step_counter.get() == 3)
+        for message_type, payload in messages:
+            await session.send_custom_message(message_type, payload)
 
     tutorial_modal_server(input, output, session)
 
@@ -250,56 +451,62 @@ def graph_ui_server(input, output, session):
         except ValueError:
             user_solution = None
 
-        correct_solution = solution.get()
+        correct_solution = state.solution.get()
 
-        if user_solution == correct_solution:
-            step_counter.set(4)
+        if correct_solution is not None and user_solution and user_solution[0] == input.start_node() and \
+                user_solution[-1] == input.target_node() and \
+                path_cost(state.graph.get(), user_solution) == correct_solution.cost:
+            # Any path with the optimal cost is accepted, ties are broken differently by the solvers
+            state.solution.set(correct_solution._replace(path=user_solution))
+            state.step_counter.set(4)
             # to draw the solution
-            handle_next_step(input)
+            handle_next_step(state, input)
         else:
-            step_explanation.set(TagList("Sorry, your solution is incorrect. Please try again."))
+            state.step_explanation.set(TagList("Sorry, your solution is incorrect. Please try again."))
 
-    @reactive.calc
-    def parsed_edge_list():
-        file: list[FileInfo] | None = input.edge_list_file()
-        if file is None:
-            print("File is None")
-            return None
-        else:
-            print(f"File: {file}")
-            return file[0]["datapath"]
 
-    @reactive.Effect
-    def use_parsed_edge_list():
-        edge_list = parsed_edge_list()
-        if edge_list is not None:
-            print(edge_list)
-            with open('/home/timo/shiny/dijkstra/edgelist.txt', 'r') as file:
-                edge_list_str = file.read()
-            print(edge_list_str)
-            result = generate_from_edge_list(edge_list_str)
-            if isinstance(result, str):
-                invalid_edge_list.set(True)
-                step_explanation.set(TagList(result))
-            else:
-                invalid_edge_list.set(False)
-                graph.set(result)
-
-
-def create_progress_bar():
+def create_progress_bar(state: SessionState):
     return TagList(
         ui.layout_columns(
             ui.input_action_button("prev_step", "Previous Step"),
             *[ui.div(
-                style=f"background-color: {'red' if step_counter.get() >= i else '#d9d9d9'}; height: 30px; width: 100%; margin: auto; display: flex; align-items: center; justify-content: center;")
+                style=f"background-color: {'red' if state.step_counter.get() >= i else '#d9d9d9'}; height: 30px; width: 100%; margin: auto; display: flex; align-items: center; justify-content: center;")
                 for i in range(4)],
             ui.input_action_button("next_step", "Next Step"),
         )
     )
 
 
-def create_explanation_ui():
-    step = step_counter.get()
+def create_frontier_ui(state: SessionState):
+    frontier, size = frontier_nodes(state)
+    if not size:
+        return None
+    shown = ", ".join(f"{label} ({format_number(cost)})" for label, cost in frontier)
+    if size > len(frontier):
+        shown += f" and {size - len(frontier)} more"
+    return TagList(ui.br(), f"Frontier, next one first: {shown}")
+
+
+def frontier_nodes(state: SessionState, limit=FRONTIER_DISPLAY_LIMIT):
+    """The first ``limit`` reached but unvisited nodes with their cost, in the order the priority queue hands
+    them out, and how many there are in total. Only the nodes up to the ``limit``-th lowest cost are sorted."""
+    G = state.graph.get()
+    distances = state.distances.get()
+    if not distances.visited.any():
+        return [], 0
+    cost = distances.cost
+    frontier = np.flatnonzero(np.isfinite(cost) & ~distances.visited)
+    size = len(frontier)
+    if size > limit:
+        # Everything up to the limit-th cost, ties included, so they are broken by index like the queue does
+        threshold = np.partition(cost[frontier], limit - 1)[limit - 1]
+        frontier = frontier[cost[frontier] <= threshold]
+    frontier = frontier[np.argsort(cost[frontier], kind="stable")][:limit]
+    return [(G.label(node), cost[node]) for node in frontier.tolist()], size
+
+
+def create_explanation_ui(state: SessionState):
+    step = state.step_counter.get()
     headings = {
         0: "Step 0: Initialize",
         1: "Step 1: Visit Nodes",
@@ -309,30 +516,61 @@ def create_explanation_ui():
     }
     return TagList(
         ui.h1(headings.get(step), style="margin-bottom: 0;"),
-        ui.p(step_explanation.get(), style="margin-top: 0;"),
+        ui.p(state.step_explanation.get(), style="margin-top: 0;"),
     )
 
 
-def update_graph_based_on_selection(input):
+def graph_request(state: SessionState, input):
+    """What to build for the current inputs, as values that can be handed to another thread. The edge list
+    editor of the session goes along with the text, it locks itself."""
     if input.selectize_graph() == GraphType.RANDOM_GRAPH.value:
         if input.k_slider() > input.n_slider():
-            step_explanation.set(TagList("Please select make sure that k is not smaller than n"))
-        else:
-            graph.set(generate_random_graph(input.n_slider(), input.k_slider(), input.p_slider()))
-    elif input.selectize_graph() == GraphType.KOOT_EXAMPLE_DEUTSCHLAND.value:
-        graph.set(generate_koot_example())
-    elif input.selectize_graph() == GraphType.EDGE_LIST.value:
+            state.step_explanation.set(TagList("Please select make sure that k is not smaller than n"))
+            return None
+        return GraphType.RANDOM_GRAPH, (input.n_slider(), input.k_slider(), input.p_slider(), input.graph_seed())
+    if input.selectize_graph() == GraphType.KOOT_EXAMPLE_DEUTSCHLAND.value:
+        return GraphType.KOOT_EXAMPLE_DEUTSCHLAND, ()
+    if input.selectize_graph() == GraphType.EDGE_LIST.value:
         edge_list_input = input.edge_list_input()
         if isinstance(edge_list_input, str):
-            result = generate_from_edge_list(input.edge_list_input())
-            if isinstance(result, str):
-                invalid_edge_list.set(True)
-                step_explanation.set(TagList(result))
-            else:
-                invalid_edge_list.set(False)
-                graph.set(result)
-        else:
-            graph.set(edge_list_input)
+            return GraphType.EDGE_LIST, (edge_list_input, state.edge_list_editor)
+    if input.selectize_graph() == GraphType.CSV_FILE.value:
+        file: list[FileInfo] | None = input.edge_list_file()
+        if file is not None:
+            return GraphType.CSV_FILE, (file[0]["datapath"],)
+    return None
+
+
+@timed("build_graph")
+def build_graph(request, seed, start, cancelled, previous=None):
+    """Build the graph, its layout and, unless ``start`` is None, the shortest path tree of the start node off
+    the event loop.
+
+    Returns the CSRGraph, an error message or None once ``cancelled`` is set.
+    """
+    graph_type, arguments = request
+    if graph_type == GraphType.RANDOM_GRAPH:
+        def generate():
+            return CSRGraph.from_networkx(generate_random_graph(*arguments))
+        # Without a seed every generation is a different graph
+        graph_seed = arguments[-1]
+        G = generate() if graph_seed is None else \
+            graph_store.get_or_build(parameters_key(graph_type.value, *arguments), generate)
+    elif graph_type == GraphType.KOOT_EXAMPLE_DEUTSCHLAND:
+        G = CSRGraph.from_networkx(generate_koot_example())
+    elif graph_type == GraphType.EDGE_LIST:
+        G = generate_from_edge_list(*arguments)
+    else:
+        G = graph_store.get_or_build(file_key(*arguments), lambda: generate_from_edge_list_file(*arguments))
+    if isinstance(G, str) or cancelled.is_set():
+        return None if cancelled.is_set() else G
+
+    compute_layout(G, seed, previous)
+    if cancelled.is_set():
+        return None
+    if start is not None and start in G:
+        shortest_path_tree(G, G.index_of(start), previous[0] if previous is not None else None)
+    return None if cancelled.is_set() else G
 
 
 def render_graph_generator_settings(input):
@@ -341,6 +579,7 @@ def render_graph_generator_settings(input):
             ui.input_slider("n_slider", "Number of Nodes", 2, 30, 8),
             ui.input_slider("k_slider", "Neighbors in a ring topology", 2, 5, 3),
             ui.input_slider("p_slider", "Probability of rewiring each edge", 0, 1, 0.5),
+            ui.input_numeric("graph_seed", "Graph Seed", value=1, min=0),
         )
     if input.selectize_graph() == GraphType.EDGE_LIST.value:
         return ui.TagList(
@@ -353,104 +592,206 @@ def render_graph_generator_settings(input):
         )
 
 
-def render_distances(input):
-    df = distances_df.get()
-
-    if contains(df.columns, "Node"):
-        try:
-            index_start = int(df.index[df['Node'].astype(int) == int(input.start_node())].item())
-            index_target = int(df.index[df['Node'].astype(int) == int(input.target_node())].item())
-        except ValueError:
-            df = pd.DataFrame({"Error": ["Selected Node not on Graph"]})
-            return render.DataTable(df, width="100%")
-
-        try:
-            styles = [
-                {"rows": index_start, "style": {"background-color": "green"}},
-                {"rows": index_target, "style": {"background-color": "red"}},
-            ]
-            return render.DataTable(distances_df.get(), width="100%", styles=styles)
-        except TypeError:
-            df = pd.DataFrame({"Error": ["Invalid data"]})
-            return render.DataTable(df, width="100%")
-
-    else:
-        try:
-            styles = [
-                {"rows": [int(input.start_node())], "style": {"background-color": "green"}},
-                {"rows": [int(input.target_node())], "style": {"background-color": "red"}},
-            ]
-            return render.DataTable(distances_df.get(), width="100%", styles=styles)
-        except TypeError:
-            df = pd.DataFrame({"Error": ["Invalid data"]})
-            return render.DataTable(df, width="100%")
-
-
-def handle_next_step(input):
-    step = step_counter.get()
-    save_state()
-    df = distances_df.get()
-    G = graph.get()
+@timed("render_distances")
+def render_distances(state: SessionState, input):
+    G = state.graph.get()
+    distances = state.distances.get()
+    if len(distances) != len(G):
+        # The graph changed and the table has not been reset for it yet
+        return render.DataTable(pd.DataFrame(), width="100%")
+    if input.start_node() not in G or input.target_node() not in G:
+        return render.DataTable(pd.DataFrame({"Error": ["Selected Node not on Graph"]}), width="100%")
+
+    styles = [
+        {"rows": [G.index_of(input.start_node())], "style": {"background-color": "green"}},
+        {"rows": [G.index_of(input.target_node())], "style": {"background-color": "red"}},
+    ]
+    repaired = state.repaired_nodes.get()
+    if repaired is not None and len(repaired):
+        styles.insert(0, {"rows": repaired[:REPAIR_HIGHLIGHT_LIMIT].tolist(), "style": {"background-color": "yellow"}})
+    return render.DataTable(distances.to_frame(G), width="100%", styles=styles)
+
+
+@timed("handle_next_step")
+def handle_next_step(state: SessionState, input):
+    step = state.step_counter.get()
+    G = state.graph.get()
+    # The trace is built before the first step is saved, it tells which rows of the table the step changes
+    loaded = step == 0 and len(state.distances.get()) > 0 and load_trace(state, input, G)
+    save_state(state, next_frame_nodes(state))
     if step == 0:
-        initialize_step(input, df, G)
+        initialize_step(state, G, loaded)
     elif step == 1:
-        visit_neighbors(df, G)
+        visit_neighbors(state, G)
     elif step == 2:
-        set_new_current_node(df, G, input)
-        if not solution.get():
-            solution.set(dijkstra_solution(G, input.start_node(), input.target_node()))
+        set_new_current_node(state, G, input)
+        if not state.solution.get():
+            state.solution.set(solve(G, input))
     elif step == 4:
-        show_solution(solution.get())
-        step_explanation.set(TagList(""))
+        show_solution(state, state.solution.get().path)
+        state.step_explanation.set(TagList(""))
+
+
+@timed("jump_to_step")
+def jump_to_step(state: SessionState, input, frame_count):
+    G = state.graph.get()
+    if state.trace.get() is None and not load_trace(state, input, G):
+        return
+    save_state(state)
+    dijkstra_trace = state.trace.get()
+    frame_count = max(1, min(frame_count, len(dijkstra_trace)))
+    trace_state = dijkstra_trace.state_at(frame_count)
+
+    visited = np.zeros(len(G), dtype=bool)
+    visited[trace_state.visited] = True
+    state.distances.set(DistanceTable(trace_state.cost, trace_state.previous, visited))
+    state.nodes_visited.set([G.node_at(node) for node in trace_state.visited])
+    state.current_node.set(G.node_at(trace_state.current))
+    state.current_edges.set([[G.node_at(a), G.node_at(b)] for a, b in trace_state.edges])
+    state.trace_cursor.set(frame_count)
+
+    step = dijkstra_trace.step_after(frame_count - 1)
+    if step == 1:
+        state.step_explanation.set(select_explanation(state.current_node.get(), False) if frame_count > 1 else
+                                   TagList("First set distance to start node to 0 and every other node to infinity"))
+    elif step == 2:
+        state.step_explanation.set(visit_explanation(state))
+    else:
+        state.step_explanation.set(select_explanation(state.current_node.get(), True))
+        if not state.solution.get():
+            state.solution.set(solve(G, input))
+    state.step_counter.set(step)
 
 
-def initialize_step(input, df, G):
-    step_explanation.set(TagList("First set distance to start node to 0 and every other node to infinity"))
-    if not df.empty:
-        start_node = input.start_node()
-        target_node = input.target_node()
-        if start_node in G.nodes:
-            start_node_error.set(False)
-        else:
-            start_node_error.set(True)
-            return
+def solve(G, input) -> PathResult:
+    return shortest_path_query(G, input.start_node(), input.target_node(), input.query_engine())
+
 
-        if target_node in G.nodes:
-            df.iloc[start_node, 1] = 0
-            if "label" in G.nodes[0]:
-                df.iloc[start_node, 2] = nx.get_node_attributes(G, "label")[start_node]
-            else:
-                df.iloc[start_node, 2] = start_node
-            distances_df.set(df)
-            nodes_visited.set(nodes_visited.get() + [start_node])
-            current_node.set(start_node)
-            step_counter.set(1)
-            target_node_error.set(False)
+def load_trace(state: SessionState, input, G):
+    if not check_query_nodes(state, input, G):
+        return False
+
+    state.trace.set(build_trace(G, input.start_node(), input.target_node()))
+    state.repaired_nodes.set(None)
+    state.trace_cursor.set(0)
+    return True
+
+
+def check_query_nodes(state: SessionState, input, G):
+    start_node = input.start_node()
+    target_node = input.target_node()
+    if start_node in G:
+        state.start_node_error.set(False)
+    else:
+        state.start_node_error.set(True)
+        return False
+
+    if target_node in G:
+        state.target_node_error.set(False)
+    else:
+        state.target_node_error.set(True)
+        return False
+    return True
+
+
+def apply_trace_frame(state: SessionState, G):
+    frame = state.trace_cursor.get()
+    dijkstra_trace = state.trace.get()
+    if frame >= len(dijkstra_trace):
+        return False
+
+    distances = state.distances.get()
+    visited, edges = [], []
+    for kind, node, other, cost in dijkstra_trace.frame_events(frame):
+        if kind == EVENT_SETTLE:
+            visited.append(G.node_at(node))
+            distances.visited[node] = True
+        elif kind == EVENT_RELAX:
+            edges.append(sorted((G.node_at(node), G.node_at(other))))
+        else:
+            distances.cost[node] = cost
+            distances.previous[node] = other
+
+    # The rows are changed in place, the history only keeps what they were before
+    state.distances.set(DistanceTable(distances.cost, distances.previous, distances.visited))
+    if dijkstra_trace.frame_kinds[frame] == FRAME_SELECT:
+        state.current_edges.set(edges)
+    elif edges:
+        state.current_edges.set(state.current_edges.get() + edges)
+    if visited:
+        state.nodes_visited.set(state.nodes_visited.get() + visited)
+        state.current_node.set(visited[-1])
+    state.trace_cursor.set(frame + 1)
+    return True
+
+
+def next_frame_nodes(state: SessionState):
+    """Indices of the table rows the next click on Next Step changes."""
+    dijkstra_trace = state.trace.get()
+    cursor = state.trace_cursor.get()
+    if dijkstra_trace is None or state.step_counter.get() not in (0, 1, 2) or cursor >= len(dijkstra_trace):
+        return np.empty(0, dtype=np.int64)
+    return dijkstra_trace.frame_nodes(cursor)
+
+
+def step_index(state: SessionState):
+    """Identifies the frame of the walkthrough that is shown. Only the solution path of the last step is not
+    fixed by the trace, any optimal path the user entered is drawn."""
+    step = state.step_counter.get()
+    path = tuple(state.solution.get().path) if step == 4 and state.solution.get() else None
+    return state.trace_cursor.get(), step, path
+
+
+def prefetch_next_frame(state: SessionState, input, size):
+    """Render the frame the Next Step button leads to in the background, so the click is a frame cache hit."""
+    dijkstra_trace = state.trace.get()
+    cursor, step = state.trace_cursor.get(), state.step_counter.get()
+    if not INCREMENTAL_RENDERING or dijkstra_trace is None or step not in (1, 2) or cursor >= len(dijkstra_trace) \
+            or None in size:
+        return
+    G = state.graph.get()
+    start, target, seed, zoom = input.start_node(), input.target_node(), input.layout_seed(), input.zoom()
+    next_step = 2 if step == 1 else dijkstra_trace.step_after(cursor)
+    key = (frame_key(G, seed, (cursor + 1, next_step, None), start, target, zoom), size)
+    if key not in frame_cache:
+        frame_prefetch_executor.submit(render_next_frame, state, G, dijkstra_trace, cursor, key, start, target, seed,
+                                       zoom, state.distances.get().cost.copy(), state.current_node.get(),
+                                       state.current_edges.get(), next_step == 3)
+
+
+def render_next_frame(state: SessionState, G, dijkstra_trace, frame, key, start, target, seed, zoom, cost,
+                      current_node, current_edges, final_step):
+    """Apply trace ``frame`` like ``apply_trace_frame`` does, but only to what the plot shows, and cache its image."""
+    edges = [] if dijkstra_trace.frame_kinds[frame] == FRAME_SELECT else list(current_edges)
+    for kind, node, other, value in dijkstra_trace.frame_events(frame):
+        if kind == EVENT_SETTLE:
+            current_node = G.node_at(node)
+        elif kind == EVENT_RELAX:
+            edges.append(sorted((G.node_at(node), G.node_at(other))))
         else:
-            target_node_error.set(True)
+            cost[node] = value
+    state.prefetch_figure = update_graph_figure(state.prefetch_figure, G, start, target, seed, cost, current_node,
+                                                edges, final_step=final_step, zoom=zoom)
+    _, size = key
+    frame_cache.put(key, render_frame(state.prefetch_figure.figure, *size))
 
 
-def visit_neighbors(df, G):
-    prev_cost = df.iloc[current_node.get(), 1]
-    neighbors, edges = [], []
-    for n in G.neighbors(current_node.get()):
-        if n not in nodes_visited.get():
-            new_weight = G[n][current_node.get()]['weight'] + prev_cost
+def initialize_step(state: SessionState, G, loaded):
+    state.step_explanation.set(TagList("First set distance to start node to 0 and every other node to infinity"))
+    if loaded:
+        apply_trace_frame(state, G)
+        state.step_counter.set(1)
 
-            neighbors.append({"node": n, "weight": (G[n][current_node.get()]['weight'] + prev_cost)})
 
-            if new_weight < df.iloc[n, 1]:
-                df.iloc[n, 1] = new_weight
-                if "label" in G.nodes[0]:
-                    df.iloc[n, 2] = nx.get_node_attributes(G, "label")[current_node.get()]
-                else:
-                    df.iloc[n, 2] = current_node.get()
+def visit_neighbors(state: SessionState, G):
+    apply_trace_frame(state, G)
+    state.step_explanation.set(visit_explanation(state))
+    state.step_counter.set(2)
 
-            edges.append(sorted((n, current_node.get())))
 
-    distances_df.set(df.copy())
-    current_edges.set(current_edges.get() + edges)
-    nodes_visited_without_current = [int(node) for node in nodes_visited.get() if node != current_node.get()]
+def visit_explanation(state: SessionState):
+    nodes_visited_without_current = [int(node) for node in state.nodes_visited.get()
+                                     if node != state.current_node.get()]
     # Casting everything to int do to different int classes: int vs np.int65
 
     nodes_visited_text = None
@@ -459,51 +800,43 @@ def visit_neighbors(df, G):
             f"We will leave nodes {nodes_visited_without_current} out as we have already visited them", ui.br()
         )
 
-    step_explanation.set(
-        TagList(
-            "Now look at the possible unvisited neighbours", ui.br(),
-            nodes_visited_text,
-            "You need to calculate the cost of all unvisited neighbours. To do this add the distance to your current node + the weight of the edge.",
+    return TagList(
+        "Now look at the possible unvisited neighbours", ui.br(),
+        nodes_visited_text,
+        "You need to calculate the cost of all unvisited neighbours. To do this add the distance to your current node + the weight of the edge.",
+        ui.br(),
+        "If the weight is lower that whats already calculated we need to update it, otherwise we won't change it",
+        ui.br(),
+    )
+
+
+def set_new_current_node(state: SessionState, G, input):
+    if not apply_trace_frame(state, G):
+        return
+
+    step = state.trace.get().step_after(state.trace_cursor.get() - 1)
+    state.step_explanation.set(select_explanation(state.current_node.get(), step == 3))
+    state.step_counter.set(step)
+
+
+def select_explanation(min_cost_node, is_target):
+    if is_target:
+        return TagList(
+            "We have now arrived at our Target node, that means we are done and have found the shortest possible distance to it",
+            ui.br(),
+            "You now have to enter your solution of the fastest path in new Box below. If it is correct you will see the path on the graph.",
             ui.br(),
-            "If the weight is lower that whats already calculated we need to update it, otherwise we won't change it",
+            "The weights of the edges are now hidden, so try to get the solution with help of the table below.",
             ui.br(),
+            "The Dijkstra Algorithm would trace the way from thr Target node via its previus node until it arrives at the start node",
         )
+    return TagList(
+        f"You can see that {min_cost_node} is the node with the lowest cost that we have not visited yet, so {min_cost_node} is our new Node. ",
+        ui.br(),
+        f"Also notice that {min_cost_node} is not our Target Node, so we need to continue and do the previous step again",
+        ui.br()
     )
-    step_counter.set(2)
-
-
-def set_new_current_node(df, G, input):
-    current_edges.set([])
-
-    unvisited_nodes = df[~df.index.isin(nodes_visited.get())]
-    min_cost_node = unvisited_nodes["Cost"].idxmin()
-    current_node.set(min_cost_node)
-
-    if current_node.get() == input.target_node():
-        step_explanation.set(
-            TagList(
-                "We have now arrived at our Target node, that means we are done and have found the shortest possible distance to it",
-                ui.br(),
-                "You now have to enter your solution of the fastest path in new Box below. If it is correct you will see the path on the graph.",
-                ui.br(),
-                "The weights of the edges are now hidden, so try to get the solution with help of the table below.",
-                ui.br(),
-                "The Dijkstra Algorithm would trace the way from thr Target node via its previus node until it arrives at the start node",
-            )
-        )
-        step_counter.set(step_counter.get() + 1)
-    else:
-        step_explanation.set(
-            TagList(
-                f"You can see that {min_cost_node} is the node with the lowest cost that we have not visited yet, so {current_node.get()} is our new Node. ",
-                ui.br(),
-                f"Also notice that {current_node.get()} is not our Target Node, so we need to continue and do the previous step again",
-                ui.br()
-            )
-        )
-        step_counter.set(step_counter.get() - 1)
-    nodes_visited.set(nodes_visited.get() + [current_node.get()])
 
 
-def show_solution(solution):
-    current_edges.set([list(edge) for edge in zip(solution, solution[1:])])
+def show_solution(state: SessionState, solution):
+    state.current_edges.set([list(edge) for edge in zip(solution, solution[1:])])
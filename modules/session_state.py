@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+from htmltools import TagList
+from shiny import reactive
+
+from utils.csr_graph import CSRGraph
+from utils.distance_table import DistanceTable
+from utils.edge_list_editor import EdgeListEditor
+from utils.undo_log import UndoLog
+
+# Sessions without any input for SESSION_IDLE_TIMEOUT seconds are closed and their state is freed.
+SESSION_IDLE_TIMEOUT = 30 * 60
+# Upper bound for the graph, walkthrough and history a single session may hold.
+SESSION_MAX_BYTES = 256 * 1024 * 1024
+# Previous Step forgets the oldest clicks once their changes take more than HISTORY_MAX_BYTES, on top of room
+# for one full copy of the distances table like the one a jump to another step keeps.
+HISTORY_MAX_BYTES = 8 * 1024 * 1024
+
+
+class SessionState:
+    """All algorithm and rendering state of one browser session."""
+
+    def __init__(self, max_bytes=SESSION_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.distances = reactive.Value(DistanceTable.empty(0))
+        self.graph = reactive.Value(CSRGraph.from_edges([], [], []))
+        self.step_counter = reactive.Value(0)
+        self.step_explanation = reactive.Value(TagList("Here will be the explanations of every step"))
+        self.current_node = reactive.Value(None)
+        self.current_edges = reactive.Value([])
+        self.nodes_visited = reactive.Value([])
+        self.state_history = reactive.Value(self.new_history())
+        self.trace = reactive.Value(None)
+        self.trace_cursor = reactive.Value(0)
+        self.invalid_edge_list = reactive.Value(False)
+        self.solution = reactive.Value()
+        self.start_node_error = reactive.Value(False)
+        self.target_node_error = reactive.Value(False)
+        # Indices of the nodes a repair of the shortest path tree after a graph edit changed, None otherwise
+        self.repaired_nodes = reactive.Value(None)
+        self.graph_figure = None
+        # Second figure, only used by the thread that renders the next frame ahead of time
+        self.prefetch_figure = None
+        self.scene_stream = None
+        # Set to cancel the graph build that is currently running for this session
+        self.graph_job = None
+        # Parsed lines of the edge list text area, an edit only parses the lines that changed
+        self.edge_list_editor = EdgeListEditor()
+        # Graph the distances table was filled for, an edit of it can be repaired instead of starting over
+        self.distances_graph = None
+
+    def new_history(self):
+        with reactive.isolate():
+            checkpoint = self.distances.get().nbytes
+        return UndoLog(min(HISTORY_MAX_BYTES, self.max_bytes // 4) + checkpoint)
+
+    def set_graph(self, G: CSRGraph):
+        if G.nbytes > self.max_bytes // 2:
+            self.step_explanation.set(TagList(
+                f"This graph needs {G.nbytes // 2 ** 20} MiB, which is more than a session may use."))
+            return False
+        self.graph.set(G)
+        return True
+
+    def nbytes(self):
+        with reactive.isolate():
+            size = self.graph.get().nbytes + self.state_history.get().nbytes
+            size += self.distances.get().nbytes
+            trace = self.trace.get()
+            if trace is not None:
+                size += trace.nbytes
+        return size
+
+    def enforce_budget(self):
+        """Forget the Previous Step history when the session grows past its memory budget."""
+        if self.nbytes() > self.max_bytes:
+            with reactive.isolate():
+                self.state_history.set(self.new_history())
+
+    def release(self):
+        """Drop everything that is expensive to keep, the session can not continue afterwards."""
+        with reactive.isolate():
+            self.graph.set(CSRGraph.from_edges([], [], []))
+            self.distances.set(DistanceTable.empty(0))
+            self.state_history.set(self.new_history())
+            self.trace.set(None)
+        self.graph_figure = None
+        self.prefetch_figure = None
+        self.scene_stream = None
+        self.edge_list_editor = None
+        self.distances_graph = None
+
+
+class SessionRegistry:
+    """Keeps track of the live sessions of this process, their memory use and when they were last active."""
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def register(self, session, state: SessionState):
+        with self._lock:
+            self._sessions[session.id] = [session, state, time.monotonic()]
+        session.on_ended(lambda: self.unregister(session.id))
+
+    def unregister(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            entry[1].release()
+
+    def touch(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            entry[2] = time.monotonic()
+
+    def memory_usage(self):
+        with self._lock:
+            entries = list(self._sessions.items())
+        return {session_id: state.nbytes() for session_id, (_, state, _) in entries}
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [(session_id, session) for session_id, (session, _, last_active) in self._sessions.items()
+                    if now - last_active > self.idle_timeout]
+        for session_id, session in idle:
+            self.unregister(session_id)
+            asyncio.ensure_future(session.close())
+        return [session_id for session_id, _ in idle]
+
+
+session_registry = SessionRegistry()
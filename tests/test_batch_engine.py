@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import batch
+from utils.batch_engine import answer, run_batch
+from utils.synthetic_graphs import grid_graph
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return grid_graph(8, 8, seed=3)
+
+
+@pytest.fixture(scope="module")
+def pairs(graph):
+    return np.random.default_rng(0).choice(graph.node_ids, (60, 2))
+
+
+@pytest.mark.parametrize("engine", ["tree", "ch"])
+def test_workers_match_one_worker_and_the_plain_engine(graph, pairs, engine):
+    # Small splits and two chunks so the pairs are spread over several pieces and windows
+    chunks = [pairs[:25], pairs[25:]]
+    single = list(run_batch(graph, chunks, engine, workers=1, split=7))
+    shared = list(run_batch(graph, chunks, engine, workers=2, split=7))
+    assert shared == single
+    assert [[start, target] for start, target, _, _ in single] == pairs.tolist()
+    for start, target, cost, _ in single:
+        assert cost == pytest.approx(answer(graph, start, target, "dijkstra")[0])
+
+
+def test_unknown_node():
+    with pytest.raises(KeyError, match="Node 999 is not in the graph"):
+        list(run_batch(grid_graph(3, 3, seed=0), [np.array([[0, 1], [0, 999]])], workers=2))
+
+
+def test_command_line(tmp_path, graph, pairs):
+    queries = tmp_path / "queries.txt"
+    queries.write_text("\n".join(f"{start} {target}" for start, target in pairs.tolist()))
+    outputs = []
+    for workers in ("1", "2"):
+        output = tmp_path / f"answers{workers}.tsv"
+        batch.main(["--synthetic", "grid", "64", "--seed", "3", str(queries), "--workers", workers, "-o", str(output)])
+        outputs.append(output.read_text())
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0].splitlines()) == len(pairs)
+
+
+def test_command_line_rejects_unknown_nodes(tmp_path):
+    queries = tmp_path / "queries.txt"
+    queries.write_text("0 1\n0 999\n")
+    with pytest.raises(SystemExit, match="Queries invalid: 'Node 999 is not in the graph'"):
+        batch.main(["--synthetic", "grid", "9", str(queries), "--workers", "2", "-o", str(tmp_path / "answers.tsv")])
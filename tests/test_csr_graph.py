@@ -0,0 +1,22 @@
+from utils.csr_graph import CSRGraph
+from utils.frame_cache import frame_key
+from utils.graph_utils import layout_key
+
+
+def test_empty_graph():
+    G = CSRGraph.from_edges([], [], [])
+    assert len(G) == 0
+    assert not G
+
+
+def test_labels_and_positions_are_part_of_drawing_keys():
+    edges = ([0, 1], [1, 2], [3, 4])
+    plain = CSRGraph.from_edges(*edges)
+    labelled = CSRGraph.from_edges(*edges, labels=["Berlin", "Bremen", "Hamburg"])
+    placed = CSRGraph.from_edges(*edges, positions=[[0, 0], [1, 0], [2, 0]])
+    # The same shortest paths, but not the same pictures
+    assert plain.fingerprint() == labelled.fingerprint() == placed.fingerprint()
+    keys = {frame_key(G, 1, (0, 0, None), 0, 1) for G in (plain, labelled, placed)}
+    assert len(keys) == 3
+    assert len({layout_key(G, 1) for G in (plain, labelled, placed)}) == 3
+    assert frame_key(plain, 1, (0, 0, None), 0, 1) == frame_key(CSRGraph.from_edges(*edges), 1, (0, 0, None), 0, 1)
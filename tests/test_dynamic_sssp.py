@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+from utils.csr_graph import CSRGraph
+from utils.dynamic_sssp import edge_changes, repair_tree, NO_PREDECESSOR
+
+
+def random_graph(rng, n=40, m=90):
+    u, v = rng.integers(0, n, m), rng.integers(0, n, m)
+    keep = u != v
+    return u[keep], v[keep], rng.integers(1, 20, keep.sum())
+
+
+def shortest_path_tree(G, source):
+    return dijkstra(G.adjacency_matrix(), directed=False, indices=source, return_predecessors=True)
+
+
+def edit(rng, u, v, w, n):
+    """Some reweighted, deleted and inserted edges of the edge list ``(u, v, w)``."""
+    w = w.copy()
+    reweighted = rng.random(len(w)) < 0.15
+    w[reweighted] = np.maximum(1, w[reweighted] + rng.integers(-10, 10, reweighted.sum()))
+    kept = rng.random(len(w)) > 0.05
+    inserted = rng.integers(0, n, (3, 2))
+    inserted = inserted[inserted[:, 0] != inserted[:, 1]]
+    return (np.concatenate([u[kept], inserted[:, 0]]), np.concatenate([v[kept], inserted[:, 1]]),
+            np.concatenate([w[kept], rng.integers(1, 20, len(inserted))]))
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_repair_matches_a_fresh_tree(seed):
+    rng = np.random.default_rng(seed)
+    n = 40
+    nodes = np.arange(n)
+    u, v, w = random_graph(rng, n)
+    old = CSRGraph.from_edges(u, v, w, nodes)
+    new = CSRGraph.from_edges(*edit(rng, u, v, w, n), nodes)
+    source = int(rng.integers(n))
+    distances, predecessors = shortest_path_tree(old, source)
+
+    repaired, repaired_predecessors, changed = repair_tree(new, source, distances, predecessors,
+                                                           edge_changes(old, new))
+    expected, _ = shortest_path_tree(new, source)
+    np.testing.assert_array_equal(repaired, expected)
+    # Every predecessor is on a shortest path
+    for node in np.flatnonzero(np.isfinite(expected) & (nodes != source)):
+        parent = repaired_predecessors[node]
+        assert repaired[parent] + new.edge_weight(parent, node) == repaired[node]
+    assert (repaired_predecessors[~np.isfinite(expected)] == NO_PREDECESSOR).all()
+    # The changed nodes are exactly the ones whose distance or predecessor differ
+    differ = np.flatnonzero((repaired != distances) | (repaired_predecessors != predecessors))
+    np.testing.assert_array_equal(changed, differ)
+    # The tree it was repaired from is left alone
+    np.testing.assert_array_equal(distances, shortest_path_tree(old, source)[0])
+
+
+def test_edge_changes():
+    nodes = np.arange(4)
+    old = CSRGraph.from_edges([0, 1, 2], [1, 2, 3], [5, 5, 5], nodes)
+    new = CSRGraph.from_edges([0, 1, 0], [1, 2, 3], [5, 7, 2], nodes)
+    u, v, old_w, new_w = edge_changes(old, new)
+    changes = sorted(zip(u.tolist(), v.tolist(), old_w.tolist(), new_w.tolist()))
+    assert changes == [(0, 3, np.inf, 2), (1, 2, 5, 7), (2, 3, 5, np.inf)]
+    assert all(len(array) == 0 for array in edge_changes(old, old))
+    assert edge_changes(old, CSRGraph.from_edges([0], [1], [1])) is None
@@ -0,0 +1,69 @@
+import io
+import random
+
+import numpy as np
+
+from utils.edge_list_editor import EdgeListEditor
+from utils.edge_list_parser import parse_edge_list
+from utils.graph_generators import generate_from_edge_list
+
+TEXT = "0 1 4\n1 2 2\n0 2 7\n2 3 1\n1 3 5"
+
+
+def assert_same_graph(G, text):
+    expected = parse_edge_list(io.StringIO(text))
+    np.testing.assert_array_equal(G.node_ids, expected.node_ids)
+    np.testing.assert_array_equal(G.offsets, expected.offsets)
+    np.testing.assert_array_equal(G.targets, expected.targets)
+    np.testing.assert_array_equal(G.weights, expected.weights)
+    assert G.weights.dtype == expected.weights.dtype
+
+
+def test_infinite_weight_is_an_error_and_the_next_edit_recovers():
+    editor = EdgeListEditor()
+    editor.update(TEXT)
+    assert editor.update(TEXT.replace("2 3 1", "2 3 inf")) == "Edgelist invalid: Line 4: 'inf' is not a valid weight"
+    assert_same_graph(editor.update(TEXT.replace("2 3 1", "2 3 3")), TEXT.replace("2 3 1", "2 3 3"))
+
+
+def test_weight_edits_keep_the_structure():
+    editor = EdgeListEditor()
+    first = editor.update(TEXT)
+    for text in (TEXT.replace("1 2 2", "1 2 2.5"), TEXT.replace("1 2 2", "1 2 9"), TEXT):
+        G = editor.update(text)
+        assert G.offsets is first.offsets and G.targets is first.targets
+        assert_same_graph(G, text)
+
+
+def test_random_edits_match_a_full_parse():
+    rng = random.Random(7)
+    lines = TEXT.splitlines()
+    editor = EdgeListEditor()
+    for _ in range(300):
+        i = rng.randrange(len(lines))
+        u, v, _ = lines[i].split()
+        choice = rng.random()
+        if choice < 0.5:
+            lines[i] = f"{u} {v} {rng.choice([1, 2, 3.5, 8])}"
+        elif choice < 0.75:
+            lines.append(f"{rng.randrange(6)} {rng.randrange(6)} {rng.randrange(1, 9)}")
+        elif len(lines) > 3:
+            del lines[i]
+        text = "\n".join(lines)
+        G = editor.update(text)
+        if not isinstance(G, str):
+            assert_same_graph(G, text)
+
+
+def test_pasted_lists_match_a_full_parse():
+    lines = [f"{i} {i + 1} {i % 7 + 1}" for i in range(1500)]
+    lines[300] = ""
+    lines[301] = "0 1500 2.5"
+    text = "\n".join(lines)
+    editor = EdgeListEditor()
+    assert_same_graph(editor.update(text), text)
+    lines[1200] = "1200 1201"
+    broken = "\n".join(lines)
+    assert editor.update(broken) == generate_from_edge_list(broken)
+    assert EdgeListEditor().update(broken) == generate_from_edge_list(broken)
+    assert EdgeListEditor().update(text + "\n7000 7001 1") == "Graph is not connected"
@@ -0,0 +1,85 @@
+import io
+
+import numpy as np
+import pytest
+
+from utils.edge_list_parser import read_edge_list, read_query_pairs, parse_edge_line, EdgeListError
+
+
+def read(text):
+    return read_edge_list(io.StringIO(text))
+
+
+@pytest.mark.parametrize("text, message", [
+    ("0 1 inf", "Line 1: 'inf' is not a valid weight"),
+    ("0 1 2\n1 2 -inf", "Line 2: '-inf' is not a valid weight"),
+    ("0 1 2\n1 2 -3", "Line 2: '-3"),
+    ("0 1 x", "Line 1: 'x' is not a valid weight"),
+    ("0 1 2\n\n2 3", "Line 3: missing field, expected three values: node node weight"),
+    ("0 1 2\n1", "Line 2: missing field"),
+    ("0 1 2 3\n1 2 3 4", "Line 1: too many fields, expected three values: node node weight"),
+    ("0 1 2\n1 2 3 4", "Line 2: too many fields"),
+    ("0 1 2\n\n1 2 3 4 5", "Line 3: too many fields"),
+    ("0 1.5 2", "Line 1: '1.5' is not a node number"),
+    ("a 1 2", "Line 1: 'a' is not a node number"),
+    ("0 inf 2", "Line 1: 'inf' is not a node number"),
+    ('"0" 1 2', "Line 1: '\"0\"' is not a node number"),
+    ("True 1 2\nFalse 2 3", "Line 1: 'True' is not a node number"),
+    ("9223372036854775808 1 2", "Line 1: '9223372036854775808' is not a node number"),
+    ("", "Edgelist is empty"),
+    ("\n  \n", "Edgelist is empty"),
+])
+def test_read_edge_list_rejects(text, message):
+    with pytest.raises(EdgeListError, match=message):
+        read(text)
+
+
+def test_read_edge_list():
+    u, v, w = read("0 1 2\n\n1 2 3\n")
+    np.testing.assert_array_equal(u, [0, 1])
+    np.testing.assert_array_equal(v, [1, 2])
+    np.testing.assert_array_equal(w, [2, 3])
+    assert w.dtype == np.int64
+    assert read("0 1 2\n1 2 0.5")[2].dtype == np.float64
+    # Whole numbers beyond int64 stay floats instead of wrapping around
+    np.testing.assert_array_equal(read("0 1 2\n1 2 1e20")[2], [2, 1e20])
+
+
+@pytest.mark.parametrize("line, message", [
+    ("0 1 nan", "'nan' is not a valid weight"),
+    ("0 1 inf", "'inf' is not a valid weight"),
+    ("0 1 1e400", "'1e400' is not a valid weight"),
+    ("0 1 " + "9" * 400, "is not a valid weight"),
+    ("0 1 -1", "'-1' is not a valid weight"),
+    ("0 1", "missing field, expected three values"),
+    ("0 1 2 3", "too many fields, expected three values"),
+    ("0 1e400 2", "'1e400' is not a node number"),
+    ("0.5 1 2", "'0.5' is not a node number"),
+    ('0 "1" 2', "'\"1\"' is not a node number"),
+    ("0 9223372036854775808 2", "is not a node number"),
+])
+def test_parse_edge_line_rejects(line, message):
+    with pytest.raises(EdgeListError, match=message):
+        parse_edge_line(line)
+
+
+def test_parse_edge_line():
+    assert parse_edge_line("  ") is None
+    assert parse_edge_line("3 4 2.5") == (3, 4, 2.5)
+    assert parse_edge_line("3 4 2") == (3, 4, 2)
+
+
+@pytest.mark.parametrize("text, message", [
+    ("0 1 2", "Line 1: too many fields, expected two values: start target"),
+    ("0 1\n1 2 3 4", "Line 2: too many fields"),
+    ("0 1\n2", "Line 2: missing field, expected two values: start target"),
+    ("0 x", "Line 1: 'x' is not a node number"),
+])
+def test_read_query_pairs_rejects(text, message):
+    with pytest.raises(EdgeListError, match=message):
+        list(read_query_pairs(io.StringIO(text)))
+
+
+def test_read_query_pairs():
+    pairs = np.concatenate(list(read_query_pairs(io.StringIO("0 1\n\n2 3\n"), chunksize=1)))
+    np.testing.assert_array_equal(pairs, [[0, 1], [2, 3]])
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+from utils.graph_store import GraphStore, parameters_key
+
+EDGES = ([0, 1, 2], [1, 2, 0], [3, 4, 5])
+
+
+def assert_same_graph(loaded, G):
+    for name in ("node_ids", "offsets", "targets", "weights"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(G, name))
+        assert getattr(loaded, name).dtype == getattr(G, name).dtype
+
+
+def test_round_trip(tmp_path):
+    store = GraphStore(str(tmp_path))
+    G = CSRGraph.from_edges(*EDGES, labels=["Berlin", "Bremen", "Hamburg"], positions=[[0, 0], [1, 0], [0, 1.5]])
+    store.save("key", G)
+    loaded = store.load("key")
+    assert_same_graph(loaded, G)
+    # Memory mapped, not read into memory
+    assert isinstance(loaded.targets, np.memmap)
+    assert loaded.labels.tolist() == ["Berlin", "Bremen", "Hamburg"]
+    np.testing.assert_array_equal(loaded.positions, G.positions)
+    assert loaded.fingerprint() == G.fingerprint()
+    assert loaded.display_fingerprint() == G.display_fingerprint()
+
+
+def test_round_trip_without_labels_and_positions(tmp_path):
+    store = GraphStore(str(tmp_path))
+    G = CSRGraph.from_edges(*EDGES)
+    store.save("key", G)
+    loaded = store.load("key")
+    assert_same_graph(loaded, G)
+    assert not loaded.has_labels and not loaded.has_positions
+    assert loaded.display_fingerprint() == G.display_fingerprint()
+
+
+def test_get_or_build(tmp_path):
+    store = GraphStore(str(tmp_path))
+    key = parameters_key("random", 10, 0.5)
+    built = []
+
+    def build():
+        built.append(True)
+        return CSRGraph.from_edges(*EDGES)
+
+    first = store.get_or_build(key, build)
+    assert_same_graph(store.get_or_build(key, build), first)
+    assert len(built) == 1
+    # Messages like "Graph is not connected" are not stored
+    assert store.get_or_build("message", lambda: "Graph is not connected") == "Graph is not connected"
+    assert store.load("message") is None
+    assert store.load("missing") is None
+
+
+def test_eviction_removes_the_least_recently_used(tmp_path):
+    store = GraphStore(str(tmp_path))
+    graphs = {key: CSRGraph.from_edges(np.arange(100), np.arange(1, 101), np.ones(100)) for key in "abc"}
+    for when, (key, G) in enumerate(graphs.items()):
+        store.save(key, G)
+        os.utime(store.path(key), (when, when))
+    size = max(entry_size for _, entry_size, _ in store.entries())
+    # Loading "a" makes it the most recently used, so "b" goes first
+    assert store.load("a") is not None
+    store.max_bytes = 2 * size
+    store.evict()
+    assert store.load("b") is None
+    assert store.load("a") is not None and store.load("c") is not None
+    store.max_bytes = 0
+    store.evict()
+    assert store.entries() == []
@@ -0,0 +1,61 @@
+import heapq
+import random
+
+from utils.indexed_heap import IndexedHeap
+
+
+def drain(heap):
+    return [heap.pop() for _ in range(len(heap))]
+
+
+def test_pop_order_matches_heapq():
+    rng = random.Random(1)
+    keys = [rng.randrange(20) for _ in range(200)]
+    heap = IndexedHeap(len(keys))
+    for node, key in enumerate(keys):
+        heap.push(node, key)
+    expected = [(key, node) for node, key in enumerate(keys)]
+    heapq.heapify(expected)
+    # Equal keys come out by index like (key, index) tuples do
+    assert drain(heap) == [heapq.heappop(expected) for _ in range(len(keys))]
+
+
+def test_decrease_key():
+    heap = IndexedHeap(4)
+    for node, key in enumerate([5, 3, 8, 6]):
+        heap.push(node, key)
+    heap.push(2, 1)
+    heap.push(3, 3)
+    assert len(heap) == 4
+    assert drain(heap) == [(1, 2), (3, 1), (3, 3), (5, 0)]
+
+
+def test_push_of_a_node_in_the_heap():
+    heap = IndexedHeap(3)
+    heap.push(0, 4)
+    heap.push(1, 2)
+    # A higher key than the current one is ignored, the node stays in the heap once
+    heap.push(0, 9)
+    heap.push(0, 4)
+    assert len(heap) == 2 and 0 in heap and 2 not in heap
+    assert heap.pop() == (2, 1)
+    assert 1 not in heap
+    # Popped nodes can be pushed again with any key
+    heap.push(1, 7)
+    assert drain(heap) == [(4, 0), (7, 1)]
+    assert not heap
+
+
+def test_random_operations_match_a_sorted_reference():
+    rng = random.Random(2)
+    heap, best = IndexedHeap(50), {}
+    for _ in range(2000):
+        if best and rng.random() < 0.3:
+            key, node = heap.pop()
+            assert (key, node) == min((key, node) for node, key in best.items())
+            del best[node]
+        else:
+            node, key = rng.randrange(50), rng.random()
+            heap.push(node, key)
+            best[node] = min(key, best.get(node, key))
+        assert len(heap) == len(best)
@@ -0,0 +1,52 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from utils.contraction_hierarchy import contraction_hierarchy
+from utils.csr_graph import CSRGraph
+from utils.query_engines import QUERY_ENGINES, path_cost, shortest_path_query, shortest_path_tree
+
+
+def random_graph(seed, n=60, m=150, fractional=False):
+    rng = np.random.default_rng(seed)
+    G = nx.gnm_random_graph(n, m, seed=seed)
+    # Node ids that are not their index catch mix ups of the two
+    G = nx.relabel_nodes(G, {node: 3 * node + 7 for node in G})
+    for u, v in G.edges:
+        G[u][v]["weight"] = float(rng.uniform(0, 10)) if fractional else int(rng.integers(0, 10))
+    return G
+
+
+@pytest.mark.parametrize("engine", sorted(QUERY_ENGINES))
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_match_networkx(engine, seed):
+    nx_graph = random_graph(seed, fractional=seed % 2 == 1)
+    G = CSRGraph.from_networkx(nx_graph)
+    if engine == "ch":
+        # Without waiting the queries are answered by another engine while the hierarchy is built
+        contraction_hierarchy(G, wait=True)
+    rng = np.random.default_rng(seed)
+    lengths = dict(nx.all_pairs_dijkstra_path_length(nx_graph))
+    for start, target in rng.choice(list(nx_graph), (40, 2)).tolist():
+        path, cost, settled = QUERY_ENGINES[engine](G, G.index_of(start), G.index_of(target))
+        if target not in lengths[start]:
+            assert path is None
+            continue
+        assert cost == pytest.approx(lengths[start][target])
+        path = [G.node_at(node) for node in path]
+        assert path[0] == start and path[-1] == target
+        assert path_cost(G, path) == pytest.approx(lengths[start][target])
+        # The tree engine answers from the cached tree of a start it has seen before
+        assert settled > 0 or engine == "tree"
+
+
+@pytest.mark.parametrize("engine", sorted(set(QUERY_ENGINES) - {"tree"}))
+def test_cached_tree_does_not_replace_the_engine(engine):
+    G = CSRGraph.from_networkx(random_graph(0))
+    start = G.node_at(0)
+    tree = shortest_path_tree(G, 0)
+    target = G.node_at(int(np.where(np.isfinite(tree.distances), tree.distances, -1).argmax()))
+    if engine == "ch":
+        contraction_hierarchy(G, wait=True)
+    assert shortest_path_query(G, start, target, "tree").settled == 0
+    assert shortest_path_query(G, start, target, engine).settled > 0
@@ -0,0 +1,20 @@
+import pytest
+
+from batch import SYNTHETIC_GRAPHS
+
+
+@pytest.mark.parametrize("kind", sorted(SYNTHETIC_GRAPHS))
+def test_same_seed_same_graph(kind):
+    generate = SYNTHETIC_GRAPHS[kind]
+    G = generate(400, 5)
+    assert generate(400, 5).display_fingerprint() == G.display_fingerprint()
+    assert generate(400, 6).fingerprint() != G.fingerprint()
+
+
+@pytest.mark.parametrize("kind", sorted(SYNTHETIC_GRAPHS))
+@pytest.mark.parametrize("n", [16, 100, 2500])
+def test_connected(kind, n):
+    for seed in range(5):
+        G = SYNTHETIC_GRAPHS[kind](n, seed)
+        assert len(G) >= n // 2
+        assert G.is_connected()
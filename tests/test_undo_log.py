@@ -0,0 +1,64 @@
+import numpy as np
+
+from utils.undo_log import UndoLog
+
+
+def copy(state):
+    return {key: value.copy() if isinstance(value, (np.ndarray, list)) else value for key, value in state.items()}
+
+
+def assert_same(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        np.testing.assert_array_equal(a[key], b[key])
+
+
+def test_round_trip():
+    rng = np.random.default_rng(0)
+    n = 50
+    state = {"cost": np.full(n, np.inf), "visited": np.zeros(n, dtype=bool), "nodes": [], "step": 0}
+    log, expected = UndoLog(), []
+    for step in range(60):
+        # Like the step engine, most steps change a few known entries in place, a jump replaces the arrays
+        jump = step % 10 == 9
+        touched = None if jump else np.unique(rng.integers(0, n, 3))
+        log.push(state, touched)
+        expected.append(copy(state))
+        if jump:
+            state = dict(state, cost=rng.random(n), visited=rng.random(n) < 0.5)
+        else:
+            state["cost"][touched] = rng.random(len(touched))
+            state["visited"][touched] = True
+        state = dict(state, nodes=state["nodes"] + [step] if step % 7 else [step], step=step + 1)
+
+    while log:
+        state = log.pop(state)
+        assert_same(state, expected.pop())
+    assert not expected
+    assert log.pop(state) is None
+
+
+def test_push_does_not_copy_unchanged_entries():
+    log = UndoLog()
+    state = {"cost": np.zeros(1_000_000), "nodes": list(range(1000))}
+    log.push(state, np.array([1, 2]))
+    state["cost"][[1, 2]] = 5
+    state = dict(state, nodes=state["nodes"] + [1000])
+    log.push(state, np.array([3]))
+    # Two entries with a few values each and the tail of one list
+    assert log.nbytes < 20_000
+    state["cost"][3] = 7
+    assert log.pop(state)["cost"][3] == 0
+    restored = log.pop(state)
+    assert restored["cost"][1] == 0 and restored["nodes"] == list(range(1000))
+
+
+def test_budget_drops_the_oldest_entries():
+    log = UndoLog(max_bytes=1000)
+    state = {"cost": np.zeros(100)}
+    for step in range(10):
+        log.push(state)
+        state = {"cost": np.full(100, step + 1.0)}
+    # Every entry is a checkpoint of 800 bytes, only the newest fits
+    assert len(log) == 1
+    assert log.pop(state)["cost"][0] == 9
@@ -0,0 +1,176 @@
+import io
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+
+from PIL import Image
+
+from utils.csr_graph import CSRGraph
+from utils.dijkstra_trace import build_trace
+from utils.frame_cache import figure_png
+from utils.graph_figure import update_graph_figure
+from utils.graph_utils import compute_layout, layout_cache, layout_key
+from utils.metrics import timed
+
+# Exported animations show EXPORT_FPS walkthrough steps per second, every frame EXPORT_SIZE pixels large.
+EXPORT_FPS = 2
+EXPORT_SIZE = (800, 600)
+# A worker renders up to this many consecutive frames at a time with one figure, only restyling it between them
+EXPORT_CHUNK = 16
+# The format of an export follows the extension of its path, a path without one is a directory of numbered PNGs
+EXPORT_FORMATS = ("gif", "mp4", "png")
+# Workers are started by a fork server, forking the threaded app could copy a lock that another thread holds
+EXPORT_START_METHOD = "forkserver"
+
+_job = None
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+class AnimationJob:
+    """Everything a worker needs to render frames of the walkthrough of one query.
+
+    Frame 0 is the graph before the first step, frame ``i`` the plot after ``i`` clicks on Next Step and, when
+    the target was reached, the last frame shows the shortest path like the app does once it was entered.
+    """
+
+    def __init__(self, G: CSRGraph, start, target, seed, size=EXPORT_SIZE, zoom=1):
+        self.graph = G
+        self.start = start
+        self.target = target
+        self.seed = seed
+        self.size = size
+        self.zoom = zoom
+        self.trace = build_trace(G, start, target)
+        self.path = self.trace.path()
+        # Computed once here, workers find it in their layout cache
+        self.pos = compute_layout(G, seed)
+        self._figure = None
+
+    def __len__(self):
+        return len(self.trace) + 1 + (self.path is not None)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_figure"] = None
+        return state
+
+    def render(self, frames):
+        """PNG bytes of the consecutive ``frames``."""
+        trace = self.trace
+        applied = min(frames[0], len(trace))
+        state = trace.state_at(applied)
+        images = []
+        for frame in frames:
+            while applied < min(frame, len(trace)):
+                trace.apply_frame(state, applied)
+                applied += 1
+            images.append(self.render_frame(frame, state))
+        return images
+
+    def render_frame(self, frame, state):
+        G = self.graph
+        if frame > len(self.trace):
+            step = 4
+            edges = [list(edge) for edge in zip(self.path, self.path[1:])]
+        else:
+            step = self.trace.step_after(frame - 1)
+            edges = [[G.node_at(a), G.node_at(b)] for a, b in state.edges]
+        current = G.node_at(state.current) if state.current >= 0 else None
+        self._figure = update_graph_figure(self._figure, G, self.start, self.target, self.seed, state.cost, current,
+                                           edges, final_step=step == 3, zoom=self.zoom)
+        return figure_png(self._figure.figure, *self.size)
+
+
+def start_worker(job: AnimationJob):
+    """Pool initializer, shares the layout of the parent so no worker computes it again."""
+    global _job
+    _job = job
+    layout_cache.put(layout_key(job.graph, job.seed), job.pos)
+
+
+def render_chunk(frames):
+    return _job.render(frames)
+
+
+def render_animation(job: AnimationJob, workers=None):
+    """Yield the PNG bytes of every frame of ``job`` in order.
+
+    With more than one worker, runs of consecutive frames are rendered by a process pool and yielded as soon as
+    they and the ones before them are done.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    chunk = max(1, min(EXPORT_CHUNK, math.ceil(len(job) / max(workers, 1))))
+    chunks = [range(begin, min(begin + chunk, len(job))) for begin in range(0, len(job), chunk)]
+    if workers <= 1:
+        for frames in chunks:
+            yield from job.render(frames)
+        return
+
+    context = multiprocessing.get_context(EXPORT_START_METHOD)
+    with context.Pool(min(workers, len(chunks)), start_worker, (job,)) as pool:
+        for images in pool.imap(render_chunk, chunks):
+            yield from images
+
+
+def export_format(path):
+    extension = os.path.splitext(path.rstrip("/"))[1].lstrip(".").lower()
+    kind = extension or "png"
+    if kind not in EXPORT_FORMATS:
+        raise ExportError(f"Can not export .{extension} files, use one of {', '.join(EXPORT_FORMATS)}")
+    return kind
+
+
+@timed("export_animation")
+def export_animation(G: CSRGraph, start, target, seed, path, fps=EXPORT_FPS, size=EXPORT_SIZE, zoom=1,
+                     workers=None):
+    """Write the walkthrough from ``start`` to ``target`` to ``path`` and return the number of frames."""
+    kind = export_format(path)
+    if kind == "mp4" and shutil.which("ffmpeg") is None:
+        raise ExportError("Exporting MP4 videos needs ffmpeg, install it or export a GIF")
+    job = AnimationJob(G, start, target, seed, size, zoom)
+    WRITERS[kind](path, render_animation(job, workers), fps)
+    return len(job)
+
+
+def animation_gif(G: CSRGraph, start, target, seed, size=EXPORT_SIZE, zoom=1, workers=None):
+    """The walkthrough as the bytes of a GIF."""
+    buffer = io.BytesIO()
+    write_gif(buffer, render_animation(AnimationJob(G, start, target, seed, size, zoom), workers), EXPORT_FPS)
+    return buffer.getvalue()
+
+
+def write_gif(path, frames, fps):
+    images = (Image.open(io.BytesIO(png)) for png in frames)
+    first = next(images)
+    first.save(path, format="GIF", save_all=True, append_images=images, duration=1000 / fps, loop=0)
+
+
+def write_mp4(path, frames, fps):
+    # The PNGs are piped to ffmpeg as they come, the padding makes odd sizes even for yuv420p
+    process = subprocess.Popen([shutil.which("ffmpeg"), "-y", "-loglevel", "error", "-f", "image2pipe",
+                                "-framerate", str(fps), "-c:v", "png", "-i", "-", "-vf",
+                                "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", path],
+                               stdin=subprocess.PIPE)
+    try:
+        for png in frames:
+            process.stdin.write(png)
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+    if returncode:
+        raise ExportError(f"ffmpeg failed with exit code {returncode}")
+
+
+def write_pngs(path, frames, fps):
+    os.makedirs(path, exist_ok=True)
+    for i, png in enumerate(frames):
+        with open(os.path.join(path, f"frame_{i:04d}.png"), "wb") as file:
+            file.write(png)
+
+
+WRITERS = {"gif": write_gif, "mp4": write_mp4, "png": write_pngs}
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+from functools import partial
+from itertools import chain
+from multiprocessing import shared_memory
+
+import networkx as nx
+import numpy as np
+
+from utils.contraction_hierarchy import contraction_hierarchy, hierarchy_cache
+from utils.csr_graph import CSRGraph
+from utils.query_engines import shortest_path_query
+
+# Arrays of the graph that the workers read, labels are not needed to answer queries.
+SHARED_ARRAYS = ("node_ids", "offsets", "targets", "weights")
+
+_graph = None
+_blocks = []
+
+
+class SharedGraph:
+    """Copies the arrays of a CSRGraph into shared memory once so every worker process can map them read-only."""
+
+    def __init__(self, G: CSRGraph):
+        self.blocks = []
+        self.specs = {}
+        for name in SHARED_ARRAYS:
+            array = getattr(G, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_graph(specs, hierarchy=None):
+    """Pool initializer, builds the worker's CSRGraph on top of the shared blocks without copying them and caches
+    the contraction hierarchy the parent built for it."""
+    global _graph
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    _graph = CSRGraph(arrays["node_ids"], arrays["offsets"], arrays["targets"], arrays["weights"])
+    if hierarchy is not None:
+        hierarchy_cache.put(_graph.fingerprint(), hierarchy)
+
+
+def answer(G: CSRGraph, start, target, engine="tree"):
+    """Return ``(cost, path)`` of one query, ``(inf, [])`` if the target can not be reached."""
+    try:
+        result = shortest_path_query(G, start, target, engine)
+    except nx.NetworkXNoPath:
+        return float("inf"), []
+    return result.cost, result.path
+
+
+def answer_chunk(pairs, engine="tree", G=None):
+    G = _graph if G is None else G
+    return [(start, target) + answer(G, start, target, engine) for start, target in pairs.tolist()]
+
+
+def run_batch(G: CSRGraph, chunks, engine="tree", workers=None, split=10_000):
+    """Answer every ``(start, target)`` pair of the ``(n, 2)`` arrays in ``chunks``.
+
+    Yields ``(start, target, cost, path)`` in input order. With more than one worker the pairs are handed out
+    ``split`` at a time to a process pool that shares the graph through shared memory.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    # The app answers with another engine while the hierarchy is built in the background, a batch waits for it
+    # once instead. Workers are daemonic and can not start a build of their own.
+    hierarchy = contraction_hierarchy(G, wait=True) if engine == "ch" else None
+    if workers <= 1:
+        for window in _windows(G, chunks, split):
+            yield from answer_chunk(window, engine, G)
+        return
+
+    with SharedGraph(G) as shared, multiprocessing.Pool(workers, attach_graph, (shared.specs, hierarchy)) as pool:
+        for window in _windows(G, chunks, split * workers * 4):
+            # Queries with the same start go to the same worker so its shortest path tree cache gets hits
+            order = np.argsort(window[:, 0], kind="stable")
+            pieces = [window[order[begin:begin + split]] for begin in range(0, len(window), split)]
+            answers = [None] * len(window)
+            for position, answer_ in zip(order.tolist(), chain.from_iterable(
+                    pool.imap(partial(answer_chunk, engine=engine), pieces))):
+                answers[position] = answer_
+            yield from answers
+
+
+def _windows(G: CSRGraph, chunks, size):
+    for chunk in chunks:
+        unknown = ~np.isin(chunk, G.node_ids)
+        if unknown.any():
+            raise KeyError(f"Node {chunk[unknown][0]} is not in the graph")
+        for begin in range(0, len(chunk), size):
+            yield chunk[begin:begin + size]
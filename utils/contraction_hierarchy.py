@@ -0,0 +1,220 @@
+import heapq
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+from utils.lru_cache import LRUCache
+
+# Witness searches stop after settling this many nodes, missing a witness only costs an extra shortcut.
+WITNESS_SETTLE_LIMIT = 200
+
+# Like the processes of an animation export, the one building hierarchies in the background of the app comes
+# from a fork server instead of forking the threads of the app with whatever locks they hold
+HIERARCHY_START_METHOD = "forkserver"
+
+hierarchy_cache = LRUCache(max_bytes=512 * 1024 * 1024)
+_executor = None
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+class ContractionHierarchy:
+    """Upward graph of a contraction hierarchy.
+
+    ``up_targets[up_offsets[v]:up_offsets[v + 1]]`` are the higher ranked neighbours of ``v`` sorted by
+    index. ``up_middles`` is the contracted node a shortcut bypasses, or -1 for an original edge.
+    """
+
+    def __init__(self, rank, up_offsets, up_targets, up_weights, up_middles):
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_middles = up_middles
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.rank, self.up_offsets, self.up_targets, self.up_weights,
+                                              self.up_middles))
+
+    def query(self, source, goal):
+        """Return ``(path, cost, settled)`` with ``path`` as node indices of the original graph."""
+        if source == goal:
+            return [source], 0, 1
+        cost = [{source: 0}, {goal: 0}]
+        previous = [{source: -1}, {goal: -1}]
+        done = [set(), set()]
+        heaps = [[(0, source)], [(0, goal)]]
+        best, meeting, settled = np.inf, -1, 0
+        while heaps[0] or heaps[1]:
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0] <= heaps[1][0]) else 1
+            node_cost, node = heapq.heappop(heaps[side])
+            if node_cost >= best:
+                heaps[side] = []
+                continue
+            if node in done[side]:
+                continue
+            done[side].add(node)
+            settled += 1
+            if node in cost[1 - side] and node_cost + cost[1 - side][node] < best:
+                best, meeting = node_cost + cost[1 - side][node], node
+            start, end = self.up_offsets[node], self.up_offsets[node + 1]
+            for neighbor, weight in zip(self.up_targets[start:end].tolist(), self.up_weights[start:end].tolist()):
+                new_cost = node_cost + weight
+                if new_cost < cost[side].get(neighbor, np.inf):
+                    cost[side][neighbor] = new_cost
+                    previous[side][neighbor] = node
+                    heapq.heappush(heaps[side], (new_cost, neighbor))
+
+        if meeting < 0:
+            return None, np.inf, settled
+        forward = _walk(previous[0], meeting)[::-1]
+        backward = _walk(previous[1], meeting)
+        nodes = forward + backward[1:]
+        path = [nodes[0]]
+        for a, b in zip(nodes, nodes[1:]):
+            path.extend(self.unpack(a, b)[1:])
+        return path, best, settled
+
+    def unpack(self, a, b):
+        """Expand the hierarchy edge ``a - b`` into the original edges it stands for."""
+        low, high = (a, b) if self.rank[a] < self.rank[b] else (b, a)
+        start, end = self.up_offsets[low], self.up_offsets[low + 1]
+        middle = self.up_middles[start + np.searchsorted(self.up_targets[start:end], high)]
+        if middle < 0:
+            return [a, b]
+        return self.unpack(a, middle) + self.unpack(middle, b)[1:]
+
+
+def _walk(previous, node):
+    path = [node]
+    while previous[path[-1]] >= 0:
+        path.append(previous[path[-1]])
+    return path
+
+
+def build_contraction_hierarchy(node_count, offsets, targets, weights):
+    adjacency = [dict() for _ in range(node_count)]
+    for node in range(node_count):
+        for neighbor, weight in zip(targets[offsets[node]:offsets[node + 1]].tolist(),
+                                    weights[offsets[node]:offsets[node + 1]].tolist()):
+            adjacency[node][neighbor] = (weight, -1)
+
+    contracted = np.zeros(node_count, dtype=bool)
+    contracted_neighbors = np.zeros(node_count, dtype=np.int64)
+    rank = np.zeros(node_count, dtype=np.int64)
+    upward = [None] * node_count
+
+    def shortcuts(node):
+        neighbors = list(adjacency[node].items())
+        needed = []
+        for i, (u, (weight_u, _)) in enumerate(neighbors):
+            others = neighbors[i + 1:]
+            if not others:
+                continue
+            limit = weight_u + max(weight for _, (weight, _) in others)
+            witness = _witness_search(adjacency, u, node, limit)
+            for w, (weight_w, _) in others:
+                if weight_u + weight_w < witness.get(w, np.inf):
+                    needed.append((u, w, weight_u + weight_w))
+        return needed
+
+    def priority(node, needed):
+        # Edge difference plus the number of already contracted neighbours to spread the contraction evenly
+        return len(needed) - len(adjacency[node]) + contracted_neighbors[node]
+
+    heap = [(priority(node, shortcuts(node)), node) for node in range(node_count)]
+    heapq.heapify(heap)
+    order = 0
+    while heap:
+        _, node = heapq.heappop(heap)
+        if contracted[node]:
+            continue
+        needed = shortcuts(node)
+        current = priority(node, needed)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, node))
+            continue
+
+        for u, w, weight in needed:
+            if weight < adjacency[u].get(w, (np.inf,))[0]:
+                adjacency[u][w] = (weight, node)
+                adjacency[w][u] = (weight, node)
+
+        upward[node] = sorted((neighbor, weight, middle) for neighbor, (weight, middle) in adjacency[node].items())
+        for neighbor in adjacency[node]:
+            del adjacency[neighbor][node]
+            contracted_neighbors[neighbor] += 1
+        adjacency[node] = {}
+        contracted[node] = True
+        rank[node] = order
+        order += 1
+
+    up_offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum([len(edges) for edges in upward], out=up_offsets[1:])
+    flat = [edge for edges in upward for edge in edges]
+    return ContractionHierarchy(rank, up_offsets,
+                                np.array([edge[0] for edge in flat], dtype=np.int64),
+                                np.array([edge[1] for edge in flat], dtype=weights.dtype),
+                                np.array([edge[2] for edge in flat], dtype=np.int64))
+
+
+def _witness_search(adjacency, source, excluded, limit):
+    cost = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        node_cost, node = heapq.heappop(heap)
+        if node_cost > cost[node]:
+            continue
+        if node_cost > limit:
+            break
+        settled += 1
+        for neighbor, (weight, _) in adjacency[node].items():
+            if neighbor == excluded:
+                continue
+            new_cost = node_cost + weight
+            if new_cost < cost.get(neighbor, np.inf):
+                cost[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+    return cost
+
+
+def contraction_hierarchy(G: CSRGraph, wait=False):
+    """Return the cached hierarchy of ``G`` or None while it is still being built in the background.
+
+    With ``wait`` the hierarchy is built in this process instead, or waited for if its build already started.
+    """
+    key = G.fingerprint()
+    hierarchy = hierarchy_cache.get(key)
+    if hierarchy is not None:
+        return hierarchy
+    if wait:
+        with _pending_lock:
+            future = _pending.get(key)
+        hierarchy = future.result() if future is not None else \
+            build_contraction_hierarchy(len(G), G.offsets, G.targets, G.weights)
+        hierarchy_cache.put(key, hierarchy)
+        return hierarchy
+
+    global _executor
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is None:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=1,
+                                                mp_context=multiprocessing.get_context(HIERARCHY_START_METHOD))
+            future = _executor.submit(build_contraction_hierarchy, len(G), G.offsets, G.targets, G.weights)
+            future.add_done_callback(lambda done: _store(key, done))
+            _pending[key] = future
+    return None
+
+
+def _store(key, future):
+    with _pending_lock:
+        _pending.pop(key, None)
+    if future.exception() is None:
+        hierarchy_cache.put(key, future.result())
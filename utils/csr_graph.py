@@ -0,0 +1,214 @@
+import hashlib
+import sys
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+class CSRGraph:
+    """Frozen, array-backed view of an undirected weighted graph.
+
+    Nodes are stored in ascending id order. The neighbours of the node at index ``i`` are
+    ``targets[offsets[i]:offsets[i + 1]]`` with the matching ``weights``. Every undirected
+    edge is stored once in each direction. ``positions`` holds the coordinates of nodes that
+    come with their own, the ``pos`` attribute in networkx.
+    """
+
+    __slots__ = ("node_ids", "offsets", "targets", "weights", "labels", "positions", "_index", "_fingerprint",
+                 "_display_fingerprint")
+
+    def __init__(self, node_ids, offsets, targets, weights, labels=None, positions=None):
+        self.node_ids = node_ids
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.labels = labels
+        self.positions = positions
+        self._index = None
+        self._fingerprint = None
+        self._display_fingerprint = None
+
+    @classmethod
+    def from_networkx(cls, G: nx.Graph, weight="weight"):
+        try:
+            nodes = sorted(G.nodes)
+        except TypeError:
+            nodes = list(G.nodes)
+
+        edges = list(G.edges(data=weight, default=1))
+        u = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+        v = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+        w = np.array([e[2] for e in edges]) if edges else np.empty(0, dtype=np.int64)
+
+        labels = None
+        if nodes and "label" in G.nodes[nodes[0]]:
+            labels = [G.nodes[node].get("label", str(node)) for node in nodes]
+
+        positions = None
+        if nodes and all("pos" in data for data in G.nodes.values()):
+            positions = [G.nodes[node]["pos"] for node in nodes]
+
+        return cls.from_edges(u, v, w, nodes=np.asarray(nodes, dtype=np.int64), labels=labels, positions=positions)
+
+    @classmethod
+    def from_edges(cls, u, v, w, nodes=None, labels=None, positions=None):
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        w = np.asarray(w)
+        if w.dtype.kind not in "iuf":
+            w = w.astype(np.float64)
+
+        if nodes is None:
+            nodes = np.sort(np.concatenate([u, v]))
+            first = np.ones(len(nodes), dtype=bool)
+            first[1:] = nodes[1:] != nodes[:-1]
+            nodes = nodes[first]
+        node_ids = np.asarray(nodes, dtype=np.int64)
+        n = len(node_ids)
+
+        if n and node_ids[-1] - node_ids[0] == n - 1 and np.all(node_ids[1:] > node_ids[:-1]):
+            # Consecutive ids, the usual case, are their index plus the first id
+            ui = u - node_ids[0]
+            vi = v - node_ids[0]
+        elif np.all(node_ids[1:] > node_ids[:-1]):
+            ui = np.searchsorted(node_ids, u)
+            vi = np.searchsorted(node_ids, v)
+        else:
+            lookup = {int(node): i for i, node in enumerate(node_ids)}
+            ui = np.fromiter((lookup[x] for x in u.tolist()), dtype=np.int64, count=len(u))
+            vi = np.fromiter((lookup[x] for x in v.tolist()), dtype=np.int64, count=len(v))
+
+        # Self loops never lie on a shortest path and duplicate edges keep the last weight,
+        # matching what nx.Graph.add_edge does.
+        keep = ui != vi
+        ui, vi, w = ui[keep], vi[keep], w[keep]
+        lo, hi = np.minimum(ui, vi), np.maximum(ui, vi)
+        key = lo * max(n, 1) + hi
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        last = np.ones(len(key), dtype=bool)
+        last[:-1] = key[1:] != key[:-1]
+        last = order[last]
+        lo, hi, w = lo[last], hi[last], w[last]
+
+        src = np.concatenate([lo, hi])
+        dst = np.concatenate([hi, lo])
+        weights = np.concatenate([w, w])
+        order = np.argsort(src * max(n, 1) + dst)
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+
+        if labels is not None:
+            labels = np.array([sys.intern(str(label)) for label in labels], dtype=object)
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.float64).reshape(n, 2)
+
+        return cls(node_ids, offsets, dst[order], weights[order], labels, positions)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node):
+        try:
+            self.index_of(node)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    @property
+    def has_labels(self):
+        return self.labels is not None
+
+    @property
+    def has_positions(self):
+        return self.positions is not None
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.targets) // 2
+
+    def index_of(self, node):
+        if self._index is None:
+            self._index = {int(node_id): i for i, node_id in enumerate(self.node_ids)}
+        return self._index[int(node)]
+
+    def node_at(self, i):
+        return int(self.node_ids[i])
+
+    def label(self, i):
+        return self.labels[i] if self.labels is not None else self.node_at(i)
+
+    def neighbors(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def edge_weight(self, i, j):
+        targets, weights = self.neighbors(i)
+        pos = np.searchsorted(targets, j)
+        if pos < len(targets) and targets[pos] == j:
+            return weights[pos]
+        raise KeyError((self.node_at(i), self.node_at(j)))
+
+    def adjacency_matrix(self):
+        return csr_matrix((self.weights, self.targets, self.offsets), shape=(len(self), len(self)))
+
+    def is_connected(self):
+        if len(self) == 0:
+            return False
+        return connected_components(self.adjacency_matrix(), directed=False, return_labels=False) == 1
+
+    def fingerprint(self):
+        """Hash of the structure and the weights of the graph, labels and positions are ignored."""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for array in (self.node_ids, self.offsets, self.targets, self.weights):
+                digest.update(str(array.dtype).encode())
+                digest.update(np.ascontiguousarray(array).data)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def display_fingerprint(self):
+        """Hash of everything a drawing of the graph shows, the fingerprint plus the labels and positions. Two
+        graphs with the same edges but other city names or coordinates share their shortest paths, not their
+        layouts or frames."""
+        if self._display_fingerprint is None:
+            digest = hashlib.blake2b(self.fingerprint().encode(), digest_size=16)
+            if self.has_labels:
+                digest.update(b"labels")
+                digest.update("\0".join(map(str, self.labels.tolist())).encode())
+            if self.has_positions:
+                digest.update(b"positions")
+                digest.update(np.ascontiguousarray(self.positions, dtype=np.float64).data)
+            self._display_fingerprint = digest.hexdigest()
+        return self._display_fingerprint
+
+    def edge_array(self):
+        """Return ``(u, v, w)`` index arrays with every undirected edge once (``u < v``)."""
+        src = np.repeat(np.arange(len(self.node_ids)), np.diff(self.offsets))
+        mask = src < self.targets
+        return src[mask], self.targets[mask], self.weights[mask]
+
+    def to_networkx(self):
+        G = nx.Graph()
+        G.add_nodes_from(self.node_ids.tolist())
+        u, v, w = self.edge_array()
+        G.add_weighted_edges_from(zip(self.node_ids[u].tolist(), self.node_ids[v].tolist(), w.tolist()))
+        if self.labels is not None:
+            nx.set_node_attributes(G, dict(zip(self.node_ids.tolist(), self.labels.tolist())), "label")
+        if self.positions is not None:
+            nx.set_node_attributes(G, dict(zip(self.node_ids.tolist(), map(tuple, self.positions.tolist()))), "pos")
+        return G
+
+    @property
+    def nbytes(self):
+        size = self.node_ids.nbytes + self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes
+        if self.labels is not None:
+            size += self.labels.nbytes + sum(sys.getsizeof(label) for label in self.labels)
+        if self.positions is not None:
+            size += self.positions.nbytes
+        return size
@@ -0,0 +1,160 @@
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+from utils.indexed_heap import IndexedHeap
+
+# One frame is one click on "Next Step" in the walkthrough.
+FRAME_INITIALIZE = 0
+FRAME_VISIT = 1
+FRAME_SELECT = 2
+
+# Events recorded inside a frame.
+EVENT_SETTLE = 0  # node becomes the current node and is marked visited
+EVENT_RELAX = 1  # edge node -> other is looked at, cost is the tentative cost of other
+EVENT_UPDATE = 2  # node gets cost and previous node other
+
+
+class TraceState:
+    __slots__ = ("cost", "previous", "visited", "current", "edges")
+
+    def __init__(self, n):
+        self.cost = np.full(n, np.inf)
+        self.previous = np.full(n, -1, dtype=np.int64)
+        self.visited = []
+        self.current = -1
+        self.edges = []
+
+
+class DijkstraTrace:
+    """Complete event log of one Dijkstra run, split into the frames of the walkthrough."""
+
+    def __init__(self, graph: CSRGraph, start, target, kinds, nodes, others, costs, frame_offsets, frame_kinds,
+                 finished):
+        self.graph = graph
+        self.start = start
+        self.target = target
+        self.kinds = kinds
+        self.nodes = nodes
+        self.others = others
+        self.costs = costs
+        self.frame_offsets = frame_offsets
+        self.frame_kinds = frame_kinds
+        self.finished = finished
+
+    def __len__(self):
+        return len(self.frame_kinds)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.kinds, self.nodes, self.others, self.costs, self.frame_offsets,
+                                              self.frame_kinds))
+
+    def frame_events(self, frame):
+        start, end = self.frame_offsets[frame], self.frame_offsets[frame + 1]
+        return zip(self.kinds[start:end].tolist(), self.nodes[start:end].tolist(), self.others[start:end].tolist(),
+                   self.costs[start:end].tolist())
+
+    def frame_nodes(self, frame):
+        """Indices of the nodes whose cost, previous node or visited flag ``frame`` changes."""
+        start, end = self.frame_offsets[frame], self.frame_offsets[frame + 1]
+        return np.unique(self.nodes[start:end][self.kinds[start:end] != EVENT_RELAX])
+
+    def step_after(self, frame):
+        """Value of the walkthrough step counter once ``frame`` has been applied."""
+        if frame < 0:
+            return 0
+        kind = self.frame_kinds[frame]
+        if kind == FRAME_SELECT:
+            return 3 if self.finished and frame == len(self) - 1 else 1
+        return 1 if kind == FRAME_INITIALIZE else 2
+
+    def apply_frame(self, state: TraceState, frame):
+        if self.frame_kinds[frame] == FRAME_SELECT:
+            state.edges = []
+        for kind, node, other, cost in self.frame_events(frame):
+            if kind == EVENT_SETTLE:
+                state.visited.append(node)
+                state.current = node
+            elif kind == EVENT_RELAX:
+                state.edges.append(tuple(sorted((node, other))))
+            else:
+                state.cost[node] = cost
+                state.previous[node] = other
+        return state
+
+    def state_at(self, frames):
+        state = TraceState(len(self.graph))
+        for frame in range(min(frames, len(self))):
+            self.apply_frame(state, frame)
+        return state
+
+    def path(self):
+        if not self.finished:
+            return None
+        state = self.state_at(len(self))
+        node = self.graph.index_of(self.target)
+        path = [node]
+        while path[-1] != state.previous[path[-1]]:
+            path.append(state.previous[path[-1]])
+        return [self.graph.node_at(node) for node in reversed(path)]
+
+
+def build_trace(G: CSRGraph, start, target):
+    source, goal = G.index_of(start), G.index_of(target)
+    offsets, targets, weights = G.offsets, G.targets, G.weights
+    # Plain lists and a bytearray bitmap, indexing them is much cheaper than indexing NumPy arrays one at a time
+    cost = [float("inf")] * len(G)
+    visited = bytearray(len(G))
+
+    kinds, nodes, others, costs = [], [], [], []
+    frame_offsets, frame_kinds = [0], []
+
+    def event(kind, node, other, value):
+        kinds.append(kind)
+        nodes.append(node)
+        others.append(other)
+        costs.append(value)
+
+    def end_frame(kind):
+        frame_offsets.append(len(kinds))
+        frame_kinds.append(kind)
+
+    cost[source] = 0
+    visited[source] = True
+    event(EVENT_UPDATE, source, source, 0)
+    event(EVENT_SETTLE, source, source, 0)
+    end_frame(FRAME_INITIALIZE)
+
+    frontier = IndexedHeap(len(G))
+    current = source
+    finished = current == goal
+    while not finished:
+        start_offset, end_offset = offsets[current], offsets[current + 1]
+        for neighbor, weight in zip(targets[start_offset:end_offset].tolist(),
+                                    weights[start_offset:end_offset].tolist()):
+            if visited[neighbor]:
+                continue
+            new_cost = cost[current] + weight
+            event(EVENT_RELAX, current, neighbor, new_cost)
+            if new_cost < cost[neighbor]:
+                cost[neighbor] = new_cost
+                event(EVENT_UPDATE, neighbor, current, new_cost)
+                frontier.push(neighbor, new_cost)
+        end_frame(FRAME_VISIT)
+
+        if not frontier:
+            end_frame(FRAME_SELECT)
+            break
+        node_cost, current = frontier.pop()
+        visited[current] = True
+        event(EVENT_SETTLE, current, current, node_cost)
+        end_frame(FRAME_SELECT)
+        finished = current == goal
+
+    if source == goal:
+        end_frame(FRAME_VISIT)
+        end_frame(FRAME_SELECT)
+
+    return DijkstraTrace(G, start, target, np.array(kinds, dtype=np.int8), np.array(nodes, dtype=np.int64),
+                         np.array(others, dtype=np.int64), np.array(costs, dtype=np.float64),
+                         np.array(frame_offsets, dtype=np.int64), np.array(frame_kinds, dtype=np.int8), finished)
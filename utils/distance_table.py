@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from utils.csr_graph import CSRGraph
+
+
+class DistanceTable:
+    """Cost, previous node and visited flag of every node, indexed like the nodes of the CSRGraph.
+
+    The walkthrough updates the arrays directly. The pandas table the user sees is only built by
+    ``to_frame`` when it is displayed.
+    """
+
+    __slots__ = ("cost", "previous", "visited")
+
+    def __init__(self, cost, previous, visited):
+        self.cost = cost
+        self.previous = previous
+        self.visited = visited
+
+    @classmethod
+    def empty(cls, n):
+        return cls(np.full(n, np.inf), np.full(n, -1, dtype=np.int64), np.zeros(n, dtype=bool))
+
+    def __len__(self):
+        return len(self.cost)
+
+    @property
+    def nbytes(self):
+        return self.cost.nbytes + self.previous.nbytes + self.visited.nbytes
+
+    def copy(self):
+        return DistanceTable(self.cost.copy(), self.previous.copy(), self.visited.copy())
+
+    def to_frame(self, G: CSRGraph):
+        nodes, index_name = node_names(G)
+        names = np.array(nodes, dtype=object)
+        previous = np.where(self.previous >= 0, names[np.maximum(self.previous, 0)], float("nan")) \
+            if len(names) else np.empty(0, dtype=object)
+        return pd.DataFrame({index_name: nodes, "Cost": self.cost, "Previous": previous})
+
+
+def node_names(G: CSRGraph):
+    if G.has_labels:
+        return G.labels.tolist(), "Cities"
+    return [str(node) for node in G.node_ids.tolist()], "Node"
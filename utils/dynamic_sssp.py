@@ -0,0 +1,113 @@
+import heapq
+
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+
+# scipy marks the start node and unreachable nodes with this predecessor
+NO_PREDECESSOR = -9999
+
+
+def edge_changes(old: CSRGraph, new: CSRGraph):
+    """``(u, v, old_weight, new_weight)`` index arrays of the edges whose weight differs between the graphs, an
+    inserted edge has an old weight of inf and a deleted one a new weight of inf. None when the nodes differ."""
+    if not np.array_equal(old.node_ids, new.node_ids):
+        return None
+    old_u, old_v, old_w = old.edge_array()
+    new_u, new_v, new_w = new.edge_array()
+    if np.array_equal(old.offsets, new.offsets) and np.array_equal(old.targets, new.targets):
+        # Only weights changed, the edges line up
+        differ = old_w != new_w
+        return old_u[differ], old_v[differ], old_w[differ].astype(float), new_w[differ].astype(float)
+
+    n = max(len(new), 1)
+    old_keys, new_keys = old_u * n + old_v, new_u * n + new_v
+    keys = np.sort(np.concatenate([old_keys, new_keys]))
+    keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    old_weights, new_weights = np.full(len(keys), np.inf), np.full(len(keys), np.inf)
+    old_weights[np.searchsorted(keys, old_keys)] = old_w
+    new_weights[np.searchsorted(keys, new_keys)] = new_w
+    differ = old_weights != new_weights
+    keys = keys[differ]
+    return keys // n, keys % n, old_weights[differ], new_weights[differ]
+
+
+def repair_tree(G: CSRGraph, source, distances, predecessors, changes):
+    """Shortest path tree of ``source`` in ``G`` from the ``distances`` and ``predecessors`` it had before the
+    ``changes`` of ``edge_changes``.
+
+    Nodes below a tree edge that got longer or was deleted lose their distance and start from their best
+    neighbour outside that subtree, both ends of edges that got shorter are relaxed, and Dijkstra runs from
+    there. Only the nodes whose distance can change are settled. Returns the new distances and predecessors and
+    the indices of the nodes whose distance or predecessor changed.
+    """
+    u, v, old_w, new_w = changes
+    offsets, targets, weights = G.offsets, G.targets, G.weights
+    old_distances, old_predecessors = distances, predecessors
+    distances, predecessors = distances.copy(), predecessors.copy()
+
+    roots = []
+    longer = new_w > old_w
+    for a, b in zip(u[longer].tolist(), v[longer].tolist()):
+        if predecessors[b] == a:
+            roots.append(b)
+        elif predecessors[a] == b:
+            roots.append(a)
+    affected = _subtrees(predecessors, roots)
+    distances[affected] = np.inf
+    predecessors[affected] = NO_PREDECESSOR
+
+    heap = []
+    touched = set(affected.tolist())
+
+    def relax(node, neighbor, new_cost):
+        distances[neighbor] = new_cost
+        predecessors[neighbor] = node
+        touched.add(neighbor)
+        heapq.heappush(heap, (new_cost, neighbor))
+
+    for node in affected.tolist():
+        start, end = offsets[node], offsets[node + 1]
+        best, best_neighbor = np.inf, NO_PREDECESSOR
+        for neighbor, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            if distances[neighbor] + weight < best:
+                best, best_neighbor = distances[neighbor] + weight, neighbor
+        if best < np.inf:
+            relax(best_neighbor, node, best)
+
+    shorter = new_w < old_w
+    for a, b, weight in zip(u[shorter].tolist(), v[shorter].tolist(), new_w[shorter].tolist()):
+        for node, neighbor in ((a, b), (b, a)):
+            if distances[node] + weight < distances[neighbor]:
+                relax(node, neighbor, distances[node] + weight)
+
+    while heap:
+        node_cost, node = heapq.heappop(heap)
+        if node_cost > distances[node]:
+            continue
+        start, end = offsets[node], offsets[node + 1]
+        for neighbor, weight in zip(targets[start:end].tolist(), weights[start:end].tolist()):
+            if node_cost + weight < distances[neighbor]:
+                relax(node, neighbor, node_cost + weight)
+
+    touched = np.fromiter(touched, dtype=np.int64, count=len(touched))
+    touched.sort()
+    changed = touched[(distances[touched] != old_distances[touched]) |
+                      (predecessors[touched] != old_predecessors[touched])]
+    return distances, predecessors, changed
+
+
+def _subtrees(predecessors, roots):
+    """Sorted indices of ``roots`` and every node below them in the tree of ``predecessors``."""
+    if not roots:
+        return np.empty(0, dtype=np.int64)
+    has_parent = predecessors >= 0
+    children = np.flatnonzero(has_parent)
+    children = children[np.argsort(predecessors[children], kind="stable")]
+    child_offsets = np.zeros(len(predecessors) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(predecessors[has_parent], minlength=len(predecessors)), out=child_offsets[1:])
+
+    nodes = list(roots)
+    for node in nodes:
+        nodes.extend(children[child_offsets[node]:child_offsets[node + 1]].tolist())
+    return np.unique(np.array(nodes, dtype=np.int64))
@@ -0,0 +1,193 @@
+import io
+import threading
+
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+from utils.edge_list_parser import parse_edge_line, read_edge_list, EdgeListError, INT64_LIMIT
+from utils.metrics import timed
+
+# Edits of more lines than this, like pasting a whole list, are parsed by read_edge_list in one go
+BULK_PARSE_LINES = 1000
+# Edits that change the weights of up to this many lines write them into the previous graph, more build it again
+WEIGHT_PATCH_LINES = 100
+# Lines are compared this many at a time before the first and after the last line an edit changed
+COMPARE_BLOCK = 1024
+
+
+class EdgeListEditor:
+    """Graph of an edge list text that is edited a few lines at a time, like the one of the text area.
+
+    ``update`` compares the new text with the previous one and only parses the lines between their common
+    beginning and end. The nodes and the weight of every line are kept in NumPy arrays, an edit replaces the
+    entries of its lines and the graph is built from the arrays by ``CSRGraph.from_edges``, with its
+    connectivity checked by scipy. So Python only ever loops over the changed lines, the work on the rest of
+    the list is vectorized. Edits that only change weights keep the nodes and edges and write the new weights
+    into a copy of the previous graph instead of building it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._lines = []
+        # Per line its smaller and larger node and its weight, zero for lines that are not an edge
+        self._low = np.empty(0, dtype=np.int64)
+        self._high = np.empty(0, dtype=np.int64)
+        self._weight = np.empty(0, dtype=np.float64)
+        # Per line whether it is an edge and whether it is blank, lines that are neither do not parse
+        self._edge = np.empty(0, dtype=bool)
+        self._blank = np.empty(0, dtype=bool)
+        self._errors = 0
+        self._graph = None
+        self._connected = False
+        self._changed = False
+        # Edges whose weight changed since the graph was built while the nodes and edges stayed the same
+        self._weight_edits = set()
+
+    @timed("edit_edge_list")
+    def update(self, text):
+        """The graph of ``text`` or, like ``generate_from_edge_list``, the message why there is none."""
+        with self._lock:
+            lines = text.splitlines()
+            begin, old_end, new_end = _changed_lines(self._lines, lines)
+            try:
+                self._apply(begin, old_end, lines[begin:new_end])
+            except Exception:
+                # Arrays that belong to neither text would break every later edit, the next one starts over
+                self._reset()
+                raise
+            self._lines = lines
+
+            if self._errors:
+                return f"Edgelist invalid: {self._first_error()}"
+            if not self._edge.any():
+                return f"Edgelist invalid: {EdgeListError('Edgelist is empty')}"
+            G = self._build()
+            if not self._connected:
+                return "Graph is not connected"
+            return G
+
+    def _apply(self, begin, old_end, lines):
+        low, high, weight, edge, blank = _parse_lines(lines)
+        old = slice(begin, old_end)
+        self._errors += _errors(edge, blank) - _errors(self._edge[old], self._blank[old])
+
+        if (len(lines) == old_end - begin and np.array_equal(edge, self._edge[old])
+                and np.array_equal(low, self._low[old]) and np.array_equal(high, self._high[old])):
+            # The same edges on the same lines, at most their weights changed
+            reweighted = weight != self._weight[old]
+            if np.count_nonzero(reweighted) > WEIGHT_PATCH_LINES:
+                self._changed = True
+            else:
+                self._weight_edits.update(zip(low[reweighted].tolist(), high[reweighted].tolist()))
+            for array, values in ((self._weight, weight), (self._blank, blank)):
+                array[old] = values
+            return
+
+        self._changed = True
+        self._low, self._high, self._weight, self._edge, self._blank = (
+            np.concatenate([array[:begin], values, array[old_end:]])
+            for array, values in ((self._low, low), (self._high, high), (self._weight, weight), (self._edge, edge),
+                                  (self._blank, blank)))
+
+    def _first_error(self):
+        line = int(np.flatnonzero(~self._edge & ~self._blank)[0])
+        try:
+            parse_edge_line(self._lines[line])
+        except EdgeListError as error:
+            return EdgeListError(str(error), line + 1)
+
+    def _weight_dtype(self):
+        # Like read_edge_list, whole numbers that fit are int64
+        weights = self._weight[self._edge]
+        if np.all(weights == np.floor(weights)) and np.all(weights < INT64_LIMIT):
+            return np.int64
+        return np.float64
+
+    def _build(self):
+        dtype = self._weight_dtype()
+        if not self._changed and self._graph is not None:
+            # A weight on a self loop can change the type of the weights without changing any edge
+            if self._weight_edits or self._graph.weights.dtype != dtype:
+                G = self._with_new_weights(self._graph, dtype)
+                if G.fingerprint() != self._graph.fingerprint():
+                    self._graph = G
+                self._weight_edits = set()
+            return self._graph
+
+        edge = self._edge
+        # Duplicate edges keep the weight of their last line, from_edges keeps the last one it is given
+        G = CSRGraph.from_edges(self._low[edge], self._high[edge], self._weight[edge].astype(dtype))
+        # Edits that end up with the same graph, like moving a line, keep the graph that is shown
+        if self._graph is None or G.fingerprint() != self._graph.fingerprint():
+            self._graph = G
+            self._connected = G.is_connected()
+        self._changed = False
+        self._weight_edits = set()
+        return self._graph
+
+    def _with_new_weights(self, G: CSRGraph, dtype):
+        """Copy of ``G`` with the weights of the edited edges, both directions are looked up in their rows."""
+        weights = G.weights.astype(dtype)
+        for low, high in self._weight_edits:
+            if low == high:
+                continue
+            lines = np.flatnonzero(self._edge & (self._low == low) & (self._high == high))
+            a, b = np.searchsorted(G.node_ids, (low, high))
+            for node, neighbor in ((a, b), (b, a)):
+                start, end = G.offsets[node], G.offsets[node + 1]
+                weights[start + np.searchsorted(G.targets[start:end], neighbor)] = self._weight[lines[-1]]
+        return CSRGraph(G.node_ids, G.offsets, G.targets, weights, G.labels, G.positions)
+
+
+def _parse_lines(lines):
+    """``(low, high, weight, edge, blank)`` arrays of ``lines``, see ``EdgeListEditor._reset``."""
+    count = len(lines)
+    blank = np.fromiter((not line or line.isspace() for line in lines), dtype=bool, count=count)
+    if count > BULK_PARSE_LINES:
+        try:
+            u, v, w = read_edge_list(io.StringIO("\n".join(lines)))
+        except EdgeListError:
+            # Some line does not parse, the loop below finds out which
+            u = None
+        edge = ~blank
+        if u is not None and len(u) == np.count_nonzero(edge):
+            low, high, weight = np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64), np.zeros(count)
+            low[edge], high[edge], weight[edge] = np.minimum(u, v), np.maximum(u, v), w
+            return low, high, weight, edge, blank
+
+    low, high = np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64)
+    weight, edge = np.zeros(count), np.zeros(count, dtype=bool)
+    for i in np.flatnonzero(~blank).tolist():
+        try:
+            u, v, w = parse_edge_line(lines[i])
+        except EdgeListError:
+            continue
+        low[i], high[i], weight[i], edge[i] = min(u, v), max(u, v), w, True
+    return low, high, weight, edge, blank
+
+
+def _errors(edge, blank):
+    return len(edge) - np.count_nonzero(edge | blank)
+
+
+def _changed_lines(old, new):
+    """``(begin, old_end, new_end)``, lines before ``begin`` and from the ends on are the same in both."""
+    limit = min(len(old), len(new))
+    # Blocks of lines are compared as list slices, which runs in C, only the last block line by line
+    begin = 0
+    while begin + COMPARE_BLOCK <= limit and old[begin:begin + COMPARE_BLOCK] == new[begin:begin + COMPARE_BLOCK]:
+        begin += COMPARE_BLOCK
+    while begin < limit and old[begin] == new[begin]:
+        begin += 1
+    old_end, new_end = len(old), len(new)
+    while (old_end - COMPARE_BLOCK >= begin and new_end - COMPARE_BLOCK >= begin
+           and old[old_end - COMPARE_BLOCK:old_end] == new[new_end - COMPARE_BLOCK:new_end]):
+        old_end -= COMPARE_BLOCK
+        new_end -= COMPARE_BLOCK
+    while old_end > begin and new_end > begin and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    return begin, old_end, new_end
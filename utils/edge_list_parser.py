@@ -0,0 +1,155 @@
+import csv
+import math
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.csr_graph import CSRGraph
+from utils.metrics import timed
+
+
+# Node numbers and whole number weights are stored as int64, larger ones are not node numbers or stay floats
+INT64_LIMIT = 2 ** 63
+
+
+class EdgeListError(ValueError):
+    def __init__(self, message, line=None):
+        super().__init__(f"Line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+@timed("read_edge_list")
+def read_edge_list(source, chunksize=1_000_000):
+    """Parse a whitespace separated ``u v weight`` edge list into ``(u, v, w)`` NumPy arrays.
+
+    ``source`` is a path or a file object. The input is read in chunks of ``chunksize`` lines, blank
+    lines are skipped and errors name the offending line.
+    """
+    us, vs, ws = [], [], []
+    for chunk in _read_rows(source, ["u", "v", "w"], "expected three values: node node weight", chunksize):
+        us.append(_node_column(chunk["u"]))
+        vs.append(_node_column(chunk["v"]))
+        ws.append(_weight_column(chunk["w"]))
+
+    if not us:
+        raise EdgeListError("Edgelist is empty")
+    return np.concatenate(us), np.concatenate(vs), np.concatenate(ws)
+
+
+def _node_column(column):
+    values = pd.to_numeric(_numbers_only(column), errors="coerce").to_numpy(dtype=float)
+    invalid = ~np.isfinite(values) | (values != np.floor(values)) | (np.abs(values) >= INT64_LIMIT)
+    if invalid.any():
+        row = int(np.flatnonzero(invalid)[0])
+        raise EdgeListError(f"'{column.iloc[row]}' is not a node number", column.index[row] + 1)
+    return values.astype(np.int64)
+
+
+def _weight_column(column):
+    values = pd.to_numeric(_numbers_only(column), errors="coerce")
+    # inf and nan would pass as whole numbers, rejecting them here also keeps them out of the int64 cast below
+    floats = values.to_numpy(dtype=float)
+    invalid = ~np.isfinite(floats) | (floats < 0)
+    if invalid.any():
+        row = int(np.flatnonzero(invalid)[0])
+        raise EdgeListError(f"'{column.iloc[row]}' is not a valid weight", column.index[row] + 1)
+    values = values.to_numpy()
+    if values.dtype.kind == "f" and np.all(values == np.floor(values)) and np.all(values < INT64_LIMIT):
+        return values.astype(np.int64)
+    return values
+
+
+def _numbers_only(column):
+    # pandas reads a column of True and False as booleans, which would pass as the numbers 1 and 0
+    return column.astype(str) if column.dtype == bool else column
+
+
+def parse_edge_line(line):
+    """``(u, v, weight)`` of one line of an edge list, None for a blank line.
+
+    Follows the rules of ``read_edge_list``, the raised EdgeListError has no line number.
+    """
+    fields = line.split()
+    if not fields:
+        return None
+    if len(fields) != 3:
+        problem = "missing field" if len(fields) < 3 else "too many fields"
+        raise EdgeListError(f"{problem}, expected three values: node node weight")
+    u, v = _node_value(fields[0]), _node_value(fields[1])
+    try:
+        weight = _number(fields[2])
+        # Also rejects integers too large for a float, which math.isfinite raises an OverflowError for
+        valid = math.isfinite(weight) and weight >= 0
+    except (ValueError, OverflowError):
+        valid = False
+    if not valid:
+        raise EdgeListError(f"'{fields[2]}' is not a valid weight")
+    return u, v, weight
+
+
+def _node_value(field):
+    try:
+        value = _number(field)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value) or value != math.floor(value) or abs(value) >= INT64_LIMIT:
+        raise EdgeListError(f"'{field}' is not a node number")
+    return int(value)
+
+
+def _number(field):
+    try:
+        return int(field)
+    except ValueError:
+        return float(field)
+
+
+@timed("parse_edge_list")
+def parse_edge_list(source, chunksize=1_000_000):
+    u, v, w = read_edge_list(source, chunksize)
+    return CSRGraph.from_edges(u, v, w)
+
+
+def read_query_pairs(source, chunksize=1_000_000):
+    """Yield ``(n, 2)`` arrays of whitespace separated ``start target`` pairs, ``chunksize`` lines at a time."""
+    for chunk in _read_rows(source, ["start", "target"], "expected two values: start target", chunksize):
+        yield np.column_stack([_node_column(chunk["start"]), _node_column(chunk["target"])])
+
+
+def _read_rows(source, names, expected, chunksize):
+    """Yield the non-blank rows of a whitespace separated file in chunks, with one column per name.
+
+    Lines with fewer or more fields than ``names`` raise an EdgeListError that names the line and ``expected``.
+    """
+    # Quotes are not special, a quoted number is not a number for parse_edge_line either.
+    # Without index_col=False pandas would take the first of too many fields as the index and read the rest
+    # shifted, the extra column catches those lines instead. Only empty fields count as missing, "nan" is a value.
+    reader = pd.read_csv(source, sep=r"\s+", header=None, names=[*names, "extra"], index_col=False,
+                         skip_blank_lines=False, keep_default_na=False, na_values=[""], quoting=csv.QUOTE_NONE,
+                         chunksize=chunksize)
+    while True:
+        try:
+            with warnings.catch_warnings():
+                # A first line with more fields than columns warns that the rest is dropped, it is an error below
+                warnings.simplefilter("ignore", pd.errors.ParserWarning)
+                chunk = next(reader, None)
+        except pd.errors.EmptyDataError:
+            return
+        except pd.errors.ParserError as error:
+            line = re.search(r"line (\d+)", str(error))
+            if line is None:
+                raise EdgeListError(str(error).replace("Error tokenizing data. C error: ", "").strip()) from error
+            raise EdgeListError(f"too many fields, {expected}", int(line.group(1))) from error
+        if chunk is None:
+            return
+        chunk = chunk[chunk.notna().any(axis=1)]
+        if chunk.empty:
+            continue
+        for problem, rows in (("too many fields", chunk["extra"].notna()),
+                              ("missing field", chunk[names].isna().any(axis=1))):
+            if rows.any():
+                row = int(np.flatnonzero(rows.to_numpy())[0])
+                raise EdgeListError(f"{problem}, {expected}", chunk.index[row] + 1)
+        yield chunk[names]
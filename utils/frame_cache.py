@@ -0,0 +1,38 @@
+import base64
+import io
+
+from utils.csr_graph import CSRGraph
+from utils.lru_cache import LRUCache
+from utils.metrics import timed
+
+# Rendered PNG frames of the graph plot, shared by all sessions. Stepping back and forth through a walkthrough
+# shows the same frames again, and so does every student who runs the same example.
+frame_cache = LRUCache(max_bytes=64 * 1024 * 1024, sizeof=lambda frame: len(frame["src"]))
+
+
+def frame_key(G: CSRGraph, seed, step, start, target, zoom=1, dark_mode=False):
+    """Key of the frame showing walkthrough ``step``, the renderer adds the size of the output to it."""
+    return G.display_fingerprint(), seed, dark_mode, step, start, target, zoom
+
+
+@timed("render_frame")
+def render_frame(figure, width, height, pixelratio, alt=None):
+    """PNG of ``figure`` at ``width`` x ``height`` CSS pixels, as the image data ``render.plot`` sends."""
+    png = figure_png(figure, width, height, pixelratio)
+    frame = {"src": "data:image/png;base64," + base64.b64encode(png).decode("ascii"), "width": "100%", "height": "100%"}
+    if alt is not None:
+        frame["alt"] = alt
+    return frame
+
+
+def figure_png(figure, width, height, pixelratio=1):
+    """PNG bytes of ``figure`` at ``width`` x ``height`` pixels times ``pixelratio``."""
+    dpi = figure.get_dpi()
+    figure.set_size_inches(width / dpi, height / dpi)
+    # The graph axes have no ticks or titles and the view keeps a margin around the nodes, so the axes fill the
+    # image. Unlike tight layout this needs no extra draw and the same state always gives the same image.
+    figure.set_layout_engine(None)
+    figure.subplots_adjust(left=0, right=1, bottom=0, top=1)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", dpi=dpi * pixelratio)
+    return buffer.getvalue()
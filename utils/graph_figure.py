@@ -0,0 +1,165 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+from matplotlib.figure import Figure
+
+from utils.csr_graph import CSRGraph
+from utils.graph_utils import compute_layout, format_number, node_colors, highlighted_edges, important_nodes, \
+    level_of_detail, view_center, viewport, EDGE_WIDTH, LABEL_OFFSET, NODE_SIZE
+from utils.metrics import timed
+
+
+class GraphFigure:
+    """Matplotlib figure of one graph and layout whose artists are created once and updated per step.
+
+    ``update`` only touches the node colors, edge colors, distance labels and edge-weight labels that
+    differ from the previous call. Labels are created the first time the level of detail asks for them.
+    """
+
+    def __init__(self, G: CSRGraph, seed, dark_mode=False, previous=None):
+        self.graph = G
+        self.seed = seed
+        self.dark_mode = dark_mode
+        self.key = (G.display_fingerprint(), seed, dark_mode)
+        self._text_color = 'white' if dark_mode == "dark" else 'black'
+        self._default_color = to_rgba(self._text_color)
+
+        self._pos = compute_layout(G, seed, previous)
+        self.figure = Figure()
+        self.figure.patch.set_facecolor('black' if dark_mode == "dark" else 'white')
+        self._ax = self.figure.add_subplot()
+        self._ax.set_axis_off()
+
+        # Colors of all nodes and edges, the collections only hold the ones the level of detail draws
+        self._u, self._v, self._w = G.edge_array()
+        self._segments = np.stack([self._pos[self._u], self._pos[self._v]], axis=1)
+        self._edge_colors = np.tile(self._default_color, (len(self._u), 1))
+        self._drawn_edges = np.empty(0, dtype=np.int64)
+        self._edges = LineCollection([], linewidths=EDGE_WIDTH, zorder=1)
+        self._ax.add_collection(self._edges)
+
+        self._node_color_names = np.full(len(G), '', dtype=object)
+        self._node_colors = np.zeros((len(G), 4))
+        self._drawn_nodes = np.empty(0, dtype=np.int64)
+        self._nodes = self._ax.scatter([], [], s=NODE_SIZE, zorder=2)
+
+        self._costs = np.full(len(G), np.nan)
+        self._view = None
+        self._detail = None
+        # Node index -> (name, label, distance) texts and edge index -> weight text, only for labels shown once
+        self._node_texts = {}
+        self._weight_texts = {}
+        self._shown_costs = {}
+        self._labelled_nodes = set()
+        self._labelled_edges = set()
+
+    def update(self, start, target, distances=None, current_node=None, current_edges=None, final_step=False, zoom=1):
+        G = self.graph
+        view = viewport(self._pos, view_center(G, start, current_node), zoom)
+        if view != self._view:
+            self._view = view
+            self._ax.set_xlim(view[0], view[1])
+            self._ax.set_ylim(view[2], view[3])
+        highlighted = highlighted_edges(G, self._u, self._v, current_edges)
+        detail = level_of_detail(self._pos, self._u, self._v, view, important_nodes(G, start, target, current_node),
+                                 np.flatnonzero(highlighted))
+
+        names = node_colors(G, start, target, current_node)
+        changed = np.flatnonzero(names != self._node_color_names)
+        if len(changed):
+            self._node_color_names[changed] = names[changed]
+            self._node_colors[changed] = to_rgba_array(names[changed].tolist())
+        if not np.array_equal(detail.drawn_nodes, self._drawn_nodes):
+            self._drawn_nodes = detail.drawn_nodes
+            self._nodes.set_offsets(self._pos[self._drawn_nodes])
+            changed = self._drawn_nodes
+        if len(changed):
+            self._nodes.set_facecolor(self._node_colors[self._drawn_nodes])
+
+        if current_edges:
+            colors = np.where(highlighted[:, None], to_rgba('tab:red'), to_rgba('black'))
+        else:
+            colors = np.tile(self._default_color, (len(self._u), 1))
+        changed = np.flatnonzero(np.any(colors != self._edge_colors, axis=1))
+        if len(changed):
+            self._edge_colors[changed] = colors[changed]
+        if not np.array_equal(detail.drawn_edges, self._drawn_edges):
+            self._drawn_edges = detail.drawn_edges
+            self._edges.set_segments(self._segments[self._drawn_edges])
+            changed = self._drawn_edges
+        if len(changed):
+            self._edges.set_color(self._edge_colors[self._drawn_edges])
+
+        if distances is not None and len(distances) == len(G):
+            self._costs = np.asarray(distances, dtype=float)
+        else:
+            self._costs = np.full(len(G), np.nan)
+
+        if self._detail is None or detail.node_size != self._detail.node_size:
+            self._nodes.set_sizes([detail.node_size])
+        if self._detail is None or detail.edge_width != self._detail.edge_width:
+            self._edges.set_linewidth(detail.edge_width)
+        self._detail = detail
+
+        labelled = set(detail.nodes.tolist())
+        for i in self._labelled_nodes - labelled:
+            for text in self._node_texts[i]:
+                if text is not None:
+                    text.set_visible(False)
+        for i in labelled:
+            self._show_node_labels(i)
+        self._labelled_nodes = labelled
+
+        labelled = set() if final_step else set(detail.edges.tolist())
+        for i in self._labelled_edges - labelled:
+            self._weight_texts[i].set_visible(False)
+        for i in labelled - self._labelled_edges:
+            self._weight_text(i).set_visible(True)
+        self._labelled_edges = labelled
+
+        return self.figure
+
+    def _show_node_labels(self, i):
+        if i not in self._node_texts:
+            x, y = self._pos[i]
+            name = self._ax.text(x, y, str(self.graph.node_ids[i]), ha='center', va='center', fontsize=12, zorder=3)
+            label = self._ax.annotate(self.graph.labels[i], (x, y), xytext=(0, -LABEL_OFFSET),
+                                      textcoords='offset points', ha='center', va='center', fontsize=12,
+                                      color=self._text_color, zorder=3) if self.graph.has_labels else None
+            distance = self._ax.annotate('', (x, y), xytext=(0, LABEL_OFFSET), textcoords='offset points',
+                                         ha='center', va='center', fontsize=12, color=self._text_color, zorder=3)
+            self._node_texts[i] = (name, label, distance)
+        name, label, distance = self._node_texts[i]
+        name.set_visible(True)
+        if label is not None:
+            label.set_visible(True)
+        cost = self._costs[i]
+        shown = self._shown_costs.get(i)
+        if shown is None or not (cost == shown or (np.isnan(cost) and np.isnan(shown))):
+            self._shown_costs[i] = cost
+            distance.set_text('' if np.isnan(cost) else format_number(cost))
+        distance.set_visible(not np.isnan(cost))
+
+    def _weight_text(self, i):
+        if i not in self._weight_texts:
+            x, y = (self._pos[self._u[i]] + self._pos[self._v[i]]) / 2
+            self._weight_texts[i] = self._ax.text(x, y, format_number(self._w[i]), ha='center', va='center',
+                                                  fontsize=10, zorder=3,
+                                                  bbox=dict(boxstyle='round', ec=(1.0, 1.0, 1.0), fc=(1.0, 1.0, 1.0)))
+        return self._weight_texts[i]
+
+
+@timed("update_graph_figure")
+def update_graph_figure(graph_figure, G: CSRGraph, start, target, seed, distances=None, current_node=None,
+                        current_edges=None, dark_mode=False, final_step=False, zoom=1):
+    """Update ``graph_figure`` in place, or build a new one when the graph, layout seed or theme changed.
+
+    A new layout starts from the one of the old figure when the graph was edited or the seed changed a little.
+    """
+    if not G:
+        return None
+    if graph_figure is None or graph_figure.key != (G.display_fingerprint(), seed, dark_mode):
+        previous = (graph_figure.graph, graph_figure.seed) if graph_figure is not None else None
+        graph_figure = GraphFigure(G, seed, dark_mode, previous)
+    graph_figure.update(start, target, distances, current_node, current_edges, final_step, zoom)
+    return graph_figure
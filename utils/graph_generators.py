@@ -1,14 +1,19 @@
-import random
+import io
 
 import networkx as nx
+import numpy as np
 
+from utils.edge_list_editor import EdgeListEditor
+from utils.edge_list_parser import parse_edge_list, EdgeListError
+from utils.synthetic_graphs import random_weights
 
-def generate_random_graph(n, k, p):
-    G = nx.connected_watts_strogatz_graph(n, k, p)
+
+def generate_random_graph(n, k, p, seed=None):
+    rng = np.random.default_rng(seed)
+    G = nx.connected_watts_strogatz_graph(n, k, p, seed=int(rng.integers(2 ** 32)))
 
     # Add random integer weights to edges
-    for (u, v) in G.edges():
-        G[u][v]['weight'] = random.randint(1, 100)
+    nx.set_edge_attributes(G, dict(zip(G.edges(), random_weights(rng, G.number_of_edges()).tolist())), "weight")
 
     return G
 
@@ -33,32 +38,29 @@ def generate_koot_example():
 
 
 def generate_from_real_edge_list(edgelist: str):
-    edgelist_correct = "\n".join(
-        [f"{u} {v} {{'weight':{w}}}" for u, v, w in (line.split() for line in edgelist.split('\n'))])
-
-    edgelist_lines = edgelist_correct.split('\n')
-    G = nx.parse_edgelist(edgelist_lines, nodetype=int)
-    # print(edgelist_lines)
-
-
+    G = parse_edge_list(io.StringIO(edgelist))
 
-    if nx.is_connected(G):
+    if G.is_connected():
         return G
     else:
         return "Graph is not connected"
 
 
-def generate_from_edge_list(edgelist: str):
-    try:
-        edgelist_lines = [f"{u} {v} {{'weight':{w}}}" for u, v, w in (line.split() for line in edgelist.split('\n'))]
-        G = nx.parse_edgelist(edgelist_lines, nodetype=int)
-    except (ValueError, SyntaxError, TypeError):
-        return "Edgelist invalid"
+def generate_from_edge_list(edgelist: str, editor: EdgeListEditor = None):
+    """Graph of ``edgelist`` or the message why there is none. With an ``editor`` only the lines that changed
+    since its previous text are parsed."""
+    if editor is not None:
+        return editor.update(edgelist)
+    return generate_from_edge_list_file(io.StringIO(edgelist))
+
 
-    for line in nx.generate_edgelist(G):
-        print(line)
+def generate_from_edge_list_file(source):
+    try:
+        G = parse_edge_list(source)
+    except EdgeListError as error:
+        return f"Edgelist invalid: {error}"
 
-    if nx.is_connected(G):
+    if G.is_connected():
         return G
     else:
         return "Graph is not connected"
@@ -0,0 +1,225 @@
+import networkx as nx
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+
+# Up to this many nodes networkx' spring layout is fast enough and keeps the familiar drawings, larger
+# graphs get the multilevel layout below.
+SPRING_LAYOUT_LIMIT = 200
+# Coarsening stops at this many nodes, or when a level merges less than COARSEN_MIN_REDUCTION of its nodes.
+COARSEST_SIZE = 50
+COARSEN_MIN_REDUCTION = 0.05
+COARSEST_ITERATIONS = 100
+# Levels of up to LEVEL_ITERATIONS_SIZE nodes get LEVEL_ITERATIONS iterations, larger ones fewer
+LEVEL_ITERATIONS = 30
+LEVEL_ITERATIONS_SIZE = 10_000
+LEVEL_MIN_ITERATIONS = 5
+# A layout is started from the previous one when the graph kept at least this share of the previous nodes,
+# or when only the seed changed by at most WARM_START_SEED_RANGE.
+WARM_START_OVERLAP = 0.5
+WARM_START_SEED_RANGE = 3
+WARM_START_ITERATIONS = 20
+
+
+def graph_layout(G: CSRGraph, seed, previous=None):
+    """Positions of the nodes of ``G`` as an ``(n, 2)`` array, centered and scaled into ``[-1, 1]``.
+
+    ``previous`` is an optional ``(graph, seed, positions)`` of the layout shown before. When ``G`` is an
+    edited version of that graph, or the same graph with a nearby seed, the layout starts from it so the
+    drawing does not jump around.
+    """
+    if G.has_positions:
+        return rescale(G.positions)
+    if len(G) > SPRING_LAYOUT_LIMIT and previous is not None and previous[1] == seed and \
+            same_edges(previous[0], G):
+        # Only weights changed, which the multilevel layout does not look at
+        return previous[2]
+    rng = np.random.default_rng(seed)
+    initial = warm_start(G, seed, previous, rng)
+    if len(G) <= SPRING_LAYOUT_LIMIT:
+        return spring_layout(G, seed, initial)
+
+    u, v, _ = G.edge_array()
+    if initial is None:
+        pos = multilevel_layout(len(G), u, v, rng)
+    else:
+        pos = refine((initial + 1) / 2, u, v, WARM_START_ITERATIONS, 0.1)
+    return rescale(pos)
+
+
+def spring_layout(G: CSRGraph, seed, initial=None):
+    nx_graph = G.to_networkx()
+    if initial is None:
+        pos = nx.spring_layout(nx_graph, seed=seed)
+    else:
+        pos = nx.spring_layout(nx_graph, pos=dict(zip(G.node_ids.tolist(), initial)), seed=seed,
+                               iterations=WARM_START_ITERATIONS)
+    return np.array([pos[node] for node in G.node_ids.tolist()]).reshape(len(G), 2)
+
+
+def same_edges(previous_graph: CSRGraph, G: CSRGraph):
+    return np.array_equal(previous_graph.node_ids, G.node_ids) and \
+        np.array_equal(previous_graph.offsets, G.offsets) and np.array_equal(previous_graph.targets, G.targets)
+
+
+def warm_start(G: CSRGraph, seed, previous, rng):
+    """Initial positions in ``[-1, 1]`` taken from the ``previous`` layout, or None to start from scratch."""
+    if previous is None:
+        return None
+    previous_graph, previous_seed, previous_pos = previous
+    if previous_graph.fingerprint() == G.fingerprint():
+        if seed is None or previous_seed is None or seed == previous_seed or \
+                abs(seed - previous_seed) > WARM_START_SEED_RANGE:
+            return None
+        # Nudge every node a little, more for seeds that are further apart
+        return previous_pos + rng.normal(scale=0.05 * abs(seed - previous_seed), size=previous_pos.shape)
+
+    index = np.searchsorted(previous_graph.node_ids, G.node_ids)
+    index = np.minimum(index, max(len(previous_graph) - 1, 0))
+    kept = previous_graph.node_ids[index] == G.node_ids if len(previous_graph) else np.zeros(len(G), dtype=bool)
+    if kept.sum() < WARM_START_OVERLAP * len(previous_graph) or not kept.any():
+        return None
+    initial = np.empty((len(G), 2))
+    initial[kept] = previous_pos[index[kept]]
+    # New nodes start at the mean of their kept neighbours, or next to a random kept node
+    u, v, _ = G.edge_array()
+    src, dst = np.concatenate([u, v]), np.concatenate([v, u])
+    known = kept[dst]
+    count = np.bincount(src[known], minlength=len(G))
+    new = np.flatnonzero(~kept)
+    for dim in range(2):
+        total = np.bincount(src[known], initial[dst[known], dim], minlength=len(G))
+        fallback = initial[rng.choice(np.flatnonzero(kept), len(new)), dim]
+        initial[new, dim] = np.where(count[new] > 0, total[new] / np.maximum(count[new], 1), fallback)
+    initial[new] += rng.normal(scale=0.01, size=(len(new), 2))
+    return initial
+
+
+def multilevel_layout(n, u, v, rng):
+    """Fruchterman-Reingold layout in the unit square, computed on ever coarser versions of the graph first.
+
+    Every level merges matched neighbours into one node. The coarsest graph is laid out from random positions,
+    every finer level starts with its nodes at the position of the node they were merged into and only
+    needs a few iterations to spread them out.
+    """
+    levels = []
+    while n > COARSEST_SIZE:
+        cluster, coarse_n = coarsen(n, u, v, rng)
+        if coarse_n > (1 - COARSEN_MIN_REDUCTION) * n:
+            break
+        levels.append((n, u, v, cluster))
+        u, v = merge_edges(cluster, coarse_n, u, v)
+        n = coarse_n
+
+    pos = refine(rng.random((n, 2)), u, v, COARSEST_ITERATIONS, 0.1)
+    for n, u, v, cluster in reversed(levels):
+        k = 1 / np.sqrt(n)
+        # Spread the nodes of a cluster over a disc that fits them at the natural edge length k, stacking the
+        # hundreds of leaves of a hub onto one point would make them all repel each other
+        size = np.bincount(cluster)[cluster]
+        angle = rng.random(n) * 2 * np.pi
+        radius = k * np.sqrt(size * rng.random(n)) / 2
+        pos = pos[cluster] + np.stack([np.cos(angle), np.sin(angle)], axis=1) * radius[:, None]
+        pos = refine(pos, u, v, level_iterations(n), 2 * k)
+    return pos
+
+
+def level_iterations(n):
+    """Iterations on a level of ``n`` nodes. The larger levels start from a good layout already and take
+    the most time per iteration, so they get fewer."""
+    return max(LEVEL_MIN_ITERATIONS, int(LEVEL_ITERATIONS * min(1.0, np.sqrt(LEVEL_ITERATIONS_SIZE / n))))
+
+
+def coarsen(n, u, v, rng):
+    """Cluster id of every node and the number of clusters.
+
+    Every node proposes to its neighbour with the smallest random key, mutual proposals are merged and nodes
+    whose proposal was not returned join the cluster of the node they proposed to, if that one was merged.
+    """
+    key = rng.random(n)
+    src, dst = np.concatenate([u, v]), np.concatenate([v, u])
+    order = np.lexsort((key[dst], src))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = src[order[1:]] != src[order[:-1]]
+    choice = np.arange(n)
+    choice[src[order[first]]] = dst[order[first]]
+
+    nodes = np.arange(n)
+    matched = (choice != nodes) & (choice[choice] == nodes)
+    cluster = np.where(matched, np.minimum(nodes, choice), nodes)
+    joins = ~matched & matched[choice]
+    cluster[joins] = cluster[choice[joins]]
+    _, cluster = np.unique(cluster, return_inverse=True)
+    return cluster, int(cluster.max()) + 1 if n else 0
+
+
+def merge_edges(cluster, n, u, v):
+    cu, cv = cluster[u], cluster[v]
+    lo, hi = np.minimum(cu, cv), np.maximum(cu, cv)
+    keys = np.unique(lo[lo != hi] * n + hi[lo != hi])
+    return keys // n, keys % n
+
+
+def refine(pos, u, v, iterations, temperature):
+    """``iterations`` Fruchterman-Reingold steps on ``pos``, the largest step shrinking from ``temperature``."""
+    pos = np.array(pos, dtype=float)
+    n = len(pos)
+    k = 1 / np.sqrt(max(n, 1))
+    for iteration in range(iterations):
+        displacement = repulsion(pos, k)
+        delta = pos[u] - pos[v]
+        force = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        for dim in range(2):
+            displacement[:, dim] -= np.bincount(u, force[:, dim], n) - np.bincount(v, force[:, dim], n)
+
+        step = temperature * (1 - iteration / iterations)
+        length = np.sqrt((displacement ** 2).sum(axis=1))
+        pos += displacement * (np.minimum(length, step) / np.maximum(length, 1e-12))[:, None]
+    return pos
+
+
+def repulsion(pos, k):
+    """Repulsive forces between nodes, approximated on a grid of cells of size ``2 * k``.
+
+    Every node is pushed away from the centroid of its own cell and of the eight cells around it, with the
+    force of all nodes of that cell together, the Barnes-Hut idea with one level. Nodes further away do not
+    repel at all, the coarser levels already placed the graph as a whole. This is linear in the number of
+    nodes, even where a hub packs many of them close together.
+    """
+    cells = np.floor(pos / (2 * k)).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    width = int(cells[:, 1].max()) + 2
+    keys, cell = np.unique(cells[:, 0] * width + cells[:, 1], return_inverse=True)
+    # One extra empty cell at the end stands in for missing neighbours
+    count = np.append(np.bincount(cell, minlength=len(keys)), 0).astype(float)
+    total = np.zeros((len(keys) + 1, 2))
+    for dim in range(2):
+        total[:-1, dim] = np.bincount(cell, pos[:, dim], len(keys))
+
+    displacement = np.zeros_like(pos)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbor_keys = keys + dx * width + dy
+            index = np.searchsorted(keys, neighbor_keys)
+            found = index < len(keys)
+            found[found] = keys[index[found]] == neighbor_keys[found]
+            neighbor = np.where(found, index, len(keys))[cell]
+            mass, centroid_total = count[neighbor], total[neighbor]
+            if dx == 0 and dy == 0:
+                # Leave the node itself out of its own cell
+                mass = mass - 1
+                centroid_total = centroid_total - pos
+            delta = pos - centroid_total / np.maximum(mass, 1)[:, None]
+            distance2 = np.maximum((delta ** 2).sum(axis=1), 1e-4 * k * k)
+            displacement += delta * (mass * k * k / distance2)[:, None]
+    return displacement
+
+
+def rescale(pos):
+    """Center ``pos`` and scale it so the largest coordinate is 1, like networkx' layouts."""
+    pos = np.array(pos, dtype=float).reshape(-1, 2)
+    if len(pos) == 0:
+        return pos
+    pos -= pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    return pos / extent if extent > 0 else pos
@@ -0,0 +1,107 @@
+import numpy as np
+from matplotlib.colors import to_hex
+
+from utils.csr_graph import CSRGraph
+from utils.graph_utils import compute_layout, format_number, node_colors, highlighted_edges, important_nodes, \
+    level_of_detail, viewport, EDGE_WIDTH, LABEL_LIMIT, NODE_SIZE
+
+# Radius of a node and width of an edge in layout units, at the full size plot_graph draws them with
+NODE_RADIUS = 0.045
+EDGE_STROKE = 0.012
+
+
+def build_scene(G: CSRGraph, seed, precision=4):
+    """Static part of a graph drawing: node positions, the edges and, with the level of detail of plot_graph,
+    which of them are drawn up front and the weights that are written."""
+    pos = compute_layout(G, seed)
+    u, v, w = G.edge_array()
+    detail = level_of_detail(pos, u, v, viewport(pos), np.empty(0, dtype=np.int64))
+    pos = np.round(pos, precision)
+    return {
+        "nodes": {
+            "x": pos[:, 0].tolist(),
+            "y": pos[:, 1].tolist(),
+            "drawn": detail.drawn_nodes.tolist(),
+            "radius": NODE_RADIUS * float(np.sqrt(detail.node_size / NODE_SIZE)),
+        },
+        "edges": {
+            "u": u.tolist(),
+            "v": v.tolist(),
+            "drawn": detail.drawn_edges.tolist(),
+            "width": EDGE_STROKE * detail.edge_width / EDGE_WIDTH,
+            "labelled": detail.edges.tolist(),
+            "weights": [format_number(weight) for weight in w[detail.edges].tolist()],
+        },
+    }
+
+
+def build_style(G: CSRGraph, start, target, distances=None, current_node=None, current_edges=None,
+                final_step=False):
+    u, v, _ = G.edge_array()
+    # Like plot_graph, names and distances are only written for every node of small graphs
+    labelled = np.arange(len(G)) if len(G) <= LABEL_LIMIT else important_nodes(G, start, target, current_node)
+    names = np.full(len(G), '', dtype=object)
+    names[labelled] = [str(node) for node in G.node_ids[labelled].tolist()]
+    labels = np.full(len(G), '', dtype=object)
+    if G.has_labels:
+        labels[labelled] = G.labels[labelled]
+    costs = np.full(len(G), '', dtype=object)
+    if distances is not None and len(distances) == len(G):
+        costs[labelled] = [format_number(cost) for cost in distances[labelled].tolist()]
+    return {
+        "nodes": np.array([to_hex(color) for color in node_colors(G, start, target, current_node)]),
+        "edges": highlighted_edges(G, u, v, current_edges),
+        "names": names,
+        "labels": labels,
+        "costs": costs,
+        "weights": not final_step,
+    }
+
+
+def style_delta(old, new):
+    """Only the entries of ``new`` that differ from ``old``, as index/value lists. Without ``old`` they are the
+    ones that differ from a new scene, where every node is blue and nothing is highlighted or written."""
+    if old is None:
+        n = len(new["nodes"])
+        blank = np.full(n, '', dtype=object)
+        old = {"nodes": np.full(n, to_hex('tab:blue')), "edges": np.zeros(len(new["edges"]), dtype=bool),
+               "names": blank, "labels": blank, "costs": blank, "weights": None}
+    delta = {}
+    for key in ("nodes", "edges", "names", "labels", "costs"):
+        changed = np.flatnonzero(new[key] != old[key])
+        if len(changed):
+            delta[key] = [changed.tolist(), new[key][changed].tolist()]
+    if old["weights"] != new["weights"]:
+        delta["weights"] = new["weights"]
+    return delta
+
+
+class SceneStream:
+    """Tracks what a browser already shows and produces the messages that bring it up to date."""
+
+    def __init__(self, output_id):
+        self.output_id = output_id
+        self.key = None
+        self.style = None
+
+    def reset(self):
+        self.key = None
+        self.style = None
+
+    def update(self, G: CSRGraph, seed, start, target, distances=None, current_node=None, current_edges=None,
+               final_step=False):
+        messages = []
+        if not G:
+            return messages
+        key = (G.display_fingerprint(), seed)
+        if key != self.key:
+            self.key = key
+            self.style = None
+            messages.append(("graph_scene", {"id": self.output_id, **build_scene(G, seed)}))
+
+        style = build_style(G, start, target, distances, current_node, current_edges, final_step)
+        delta = style_delta(self.style, style)
+        self.style = style
+        if delta:
+            messages.append(("graph_style", {"id": self.output_id, **delta}))
+        return messages
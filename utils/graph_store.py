@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+
+from utils.csr_graph import CSRGraph
+from utils.metrics import timed
+
+# Parsed uploads and generated graphs are saved on disk, named by the hash of the uploaded bytes or of the generator
+# parameters, so the same upload or the same parameters load without parsing in every session and after restarts.
+# Set DIJKSTRA_GRAPH_STORE to keep them somewhere else, the least recently used graphs are deleted once the store
+# grows past GRAPH_STORE_MAX_BYTES.
+GRAPH_STORE_DIR = os.environ.get("DIJKSTRA_GRAPH_STORE", os.path.join(tempfile.gettempdir(), "dijkstra-graphs"))
+GRAPH_STORE_MAX_BYTES = 1024 * 1024 * 1024
+# Bump when the files of a stored graph change, graphs of other versions are not read
+GRAPH_STORE_VERSION = 1
+ARRAYS = ("node_ids", "offsets", "targets", "weights")
+
+
+def bytes_key(data: bytes):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_key(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parameters_key(*parameters):
+    return bytes_key(json.dumps(parameters).encode())
+
+
+class GraphStore:
+    """Directory of graphs, one subdirectory of ``.npy`` files per key.
+
+    The arrays are memory mapped when a graph is loaded, so only the pages a query touches are read. The
+    fingerprint is saved with them and not computed again.
+    """
+
+    def __init__(self, directory=GRAPH_STORE_DIR, max_bytes=GRAPH_STORE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.v{GRAPH_STORE_VERSION}")
+
+    @timed("graph_store_load")
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as file:
+                meta = json.load(file)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+        except (OSError, ValueError, KeyError):
+            return None
+        # The modification time is the last use, eviction removes the oldest
+        os.utime(path)
+        labels = arrays.get("labels")
+        G = CSRGraph(*(arrays[name] for name in ARRAYS),
+                     labels=labels.astype(object) if labels is not None else None, positions=arrays.get("positions"))
+        G._fingerprint = meta["fingerprint"]
+        return G
+
+    @timed("graph_store_save")
+    def save(self, key, G: CSRGraph):
+        arrays = {name: getattr(G, name) for name in ARRAYS}
+        if G.has_labels:
+            arrays["labels"] = G.labels.astype(str)
+        if G.has_positions:
+            arrays["positions"] = G.positions
+        os.makedirs(self.directory, exist_ok=True)
+        # Written next to the final directory and renamed, so a graph is either complete or not there
+        partial = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(partial)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(partial, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            with open(os.path.join(partial, "meta.json"), "w") as file:
+                json.dump({"fingerprint": G.fingerprint(), "arrays": list(arrays)}, file)
+            os.rename(partial, self.path(key))
+        except OSError:
+            # Another thread stored the same key first, or the disk is full
+            shutil.rmtree(partial, ignore_errors=True)
+        self.evict()
+
+    def get_or_build(self, key, build):
+        """The stored graph of ``key``, or the result of ``build()`` which is stored if it is a CSRGraph."""
+        G = self.load(key)
+        if G is None:
+            G = build()
+            if isinstance(G, CSRGraph):
+                self.save(key, G)
+        return G
+
+    def entries(self):
+        """``(last use, bytes, path)`` of every stored graph."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                files = [os.path.join(path, file) for file in os.listdir(path)]
+                entries.append((os.path.getmtime(path), sum(os.path.getsize(file) for file in files), path))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries())
+            size = sum(entry_size for _, entry_size, _ in entries)
+            for _, entry_size, path in entries:
+                if size <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                size -= entry_size
+
+
+graph_store = GraphStore()
@@ -1,22 +1,164 @@
+from typing import NamedTuple
+
 import matplotlib.pyplot as plt
-import networkx as nx
-from networkx.classes import Graph
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from utils.csr_graph import CSRGraph
+from utils.graph_layout import graph_layout
+from utils.lru_cache import LRUCache
+from utils.metrics import timed
+from utils.query_engines import shortest_path_query
+
+# Layouts only depend on the graph and the seed, so every render of the same graph shares them.
+layout_cache = LRUCache(max_bytes=64 * 1024 * 1024)
+# Level of detail: names, distances and edge weights are only written while at most LABEL_LIMIT nodes, or
+# edges, are in view. Above that only the start, target and current node keep their labels, and markers and
+# edges get thinner. Of more than DRAW_LIMIT nodes or edges in view only every k-th is drawn, so the render
+# time stays bounded however large the graph is.
+LABEL_LIMIT = 150
+DRAW_LIMIT = 20_000
+NODE_SIZE = 400
+EDGE_WIDTH = 3
+# Distance above and label below a node, in points so they stay next to the node at every zoom level
+LABEL_OFFSET = 16
+
+
+class LevelOfDetail(NamedTuple):
+    nodes: np.ndarray
+    edges: np.ndarray
+    drawn_nodes: np.ndarray
+    drawn_edges: np.ndarray
+    node_size: float
+    edge_width: float
+
+
+def dijkstra_solution(G, start: int, target: int, weight="weight", engine="tree"):
+    if not isinstance(G, CSRGraph):
+        G = CSRGraph.from_networkx(G, weight=weight)
+    return shortest_path_query(G, start, target, engine).path
+
+
+def format_number(value):
+    if value == float('inf'):
+        return '∞'
+    return str(int(value)) if float(value).is_integer() else f"{value:g}"
+
+
+def node_colors(G: CSRGraph, start, target, current_node=None):
+    colors = np.full(len(G), 'tab:blue', dtype=object)
+    if current_node in G:
+        colors[G.index_of(current_node)] = 'tab:pink'
+    if target in G:
+        colors[G.index_of(target)] = 'tab:red'
+    if start in G:
+        colors[G.index_of(start)] = 'tab:green'
+    return colors
+
+
+def highlighted_edges(G: CSRGraph, u, v, current_edges):
+    """Boolean mask over the edges ``(u, v)`` of ``G.edge_array()`` that appear in ``current_edges``."""
+    if not current_edges:
+        return np.zeros(len(u), dtype=bool)
+    pairs = np.array([sorted((G.index_of(a), G.index_of(b))) for a, b in current_edges if a in G and b in G],
+                     dtype=np.int64).reshape(-1, 2)
+    n = max(len(G), 1)
+    return np.isin(u * n + v, pairs[:, 0] * n + pairs[:, 1])
+
+
+def viewport(pos, center=None, zoom=1):
+    """``(xmin, xmax, ymin, ymax)`` that shows the layout ``pos`` ``zoom`` times enlarged towards node index
+    ``center``. At zoom 1 the whole layout is in view, the more it is zoomed the closer ``center`` gets to
+    the middle of the view."""
+    zoom = max(zoom, 1)
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    middle = (low + high) / 2
+    if center is not None:
+        middle = middle + (pos[center] - middle) * (1 - 1 / zoom)
+    half = np.maximum((high - low) * 0.65, 0.1) / zoom
+    (xmin, ymin), (xmax, ymax) = middle - half, middle + half
+    return float(xmin), float(xmax), float(ymin), float(ymax)
+
+
+def level_of_detail(pos, u, v, view, important, highlighted=None):
+    """What to draw of the layout ``pos`` with edges ``(u, v)`` in ``view``.
 
+    ``important`` node indices and ``highlighted`` edge indices are always drawn, and the important nodes
+    keep their labels when there are too many nodes in view.
+    """
+    xmin, xmax, ymin, ymax = view
+    inside = (pos[:, 0] >= xmin) & (pos[:, 0] <= xmax) & (pos[:, 1] >= ymin) & (pos[:, 1] <= ymax)
+    visible = np.flatnonzero(inside)
+    nodes = visible if len(visible) <= LABEL_LIMIT else np.intersect1d(important, visible)
+    midpoints = (pos[u] + pos[v]) / 2
+    edges = np.flatnonzero((midpoints[:, 0] >= xmin) & (midpoints[:, 0] <= xmax) &
+                           (midpoints[:, 1] >= ymin) & (midpoints[:, 1] <= ymax))
+    if len(edges) > LABEL_LIMIT:
+        edges = edges[:0]
+    # An edge is drawn when one of its ends is in view
+    visible_edges = np.flatnonzero(inside[u] | inside[v])
+    drawn_nodes = np.union1d(thin_out(visible), important)
+    drawn_edges = thin_out(visible_edges)
+    if highlighted is not None:
+        drawn_edges = np.union1d(drawn_edges, highlighted)
+    scale = min(1.0, LABEL_LIMIT / max(len(visible), 1))
+    return LevelOfDetail(nodes, edges, drawn_nodes, drawn_edges, NODE_SIZE * max(scale, 0.01),
+                         EDGE_WIDTH * max(np.sqrt(scale), 0.1))
 
 
-def dijkstra_solution(G: Graph, start: int, target: int, weight="weight"):
-    return nx.dijkstra_path(G, start, target, weight=weight)
+def thin_out(indices, limit=DRAW_LIMIT):
+    """Every k-th of ``indices``, with k chosen so at most ``limit`` remain."""
+    return indices[::-(-len(indices) // limit)] if len(indices) > limit else indices
 
 
-def plot_graph(G, start, target, seed, distances=None, current_node=None, current_edges=None, dark_mode=False,
-               final_step=False):
-    width: int = 3
+def important_nodes(G: CSRGraph, start, target, current_node=None):
+    return np.array(sorted({G.index_of(node) for node in (start, target, current_node) if node in G}),
+                    dtype=np.int64)
+
+
+def view_center(G: CSRGraph, start, current_node=None):
+    """The view follows the current node of the walkthrough, before the first step it shows the start node."""
+    for node in (current_node, start):
+        if node in G:
+            return G.index_of(node)
+    return None
+
+
+@timed("compute_layout")
+def compute_layout(G: CSRGraph, seed, previous=None):
+    """Cached layout of ``G``. ``previous`` is the ``(graph, seed)`` whose layout was shown before, a new
+    layout starts from it when the graph was only edited or the seed only changed a little."""
+    return layout_cache.get_or_compute(layout_key(G, seed), lambda: _compute_layout(G, seed, previous))
+
+
+def layout_key(G: CSRGraph, seed):
+    return G.display_fingerprint(), seed
+
+
+def _compute_layout(G: CSRGraph, seed, previous):
+    if previous is not None:
+        previous_graph, previous_seed = previous
+        previous_pos = layout_cache.get(layout_key(previous_graph, previous_seed))
+        previous = (previous_graph, previous_seed, previous_pos) if previous_pos is not None else None
+    pos = graph_layout(G, seed, previous)
+    pos.flags.writeable = False
+    return pos
+
+
+@timed("plot_graph")
+def plot_graph(G: CSRGraph, start, target, seed, distances=None, current_node=None, current_edges=None,
+               dark_mode=False, final_step=False, zoom=1):
     if current_edges is None:
         current_edges = []
     if not G:
         return None
 
-    pos = nx.spring_layout(G, seed=seed)
+    pos = compute_layout(G, seed)
+    view = viewport(pos, view_center(G, start, current_node), zoom)
+    u, v, w = G.edge_array()
+    highlighted = highlighted_edges(G, u, v, current_edges)
+    detail = level_of_detail(pos, u, v, view, important_nodes(G, start, target, current_node),
+                             np.flatnonzero(highlighted))
 
     if dark_mode == "dark":
         plt.style.use('dark_background')
@@ -24,53 +166,42 @@ def plot_graph(G, start, target, seed, distances=None, current_node=None, curren
     else:
         plt.style.use('default')
         default_color = 'black'
+    ax = plt.gca()
+
+    # Draw Edges
+    drawn = detail.drawn_edges
+    edge_color = default_color
+    if current_edges:
+        edge_color = np.where(highlighted[drawn], 'tab:red', 'black').tolist()
+    ax.add_collection(LineCollection(np.stack([pos[u[drawn]], pos[v[drawn]]], axis=1), colors=edge_color,
+                                     linewidths=detail.edge_width, zorder=1))
 
     # Draw Node Color
-    node_color_map = []
-    for node in G:
-        if node == start:
-            node_color_map.append('tab:green')
-        elif node == target:
-            node_color_map.append('tab:red')
-        elif node == current_node:
-            node_color_map.append('tab:pink')
-        else:
-            node_color_map.append('tab:blue')
-
-    nx.draw_networkx_nodes(G, pos, node_color=node_color_map, node_size=400)
-    nx.draw_networkx_labels(G, pos)
+    drawn = detail.drawn_nodes
+    ax.scatter(pos[drawn, 0], pos[drawn, 1], s=detail.node_size,
+               c=node_colors(G, start, target, current_node)[drawn].tolist(), zorder=2)
+    names = G.node_ids[detail.nodes].tolist()
+    for (x, y), node in zip(pos[detail.nodes], names):
+        ax.text(x, y, str(node), ha='center', va='center', fontsize=12, zorder=3)
 
     # Draw labels
-    if "label" in G.nodes[0]:
-        labels = dict(sorted(nx.get_node_attributes(G, "label").items()))
-        label_pos = {node: (coords[0], coords[1] - 0.13) for node, coords in pos.items()}
-        nx.draw_networkx_labels(G, label_pos, labels, font_color=default_color)
-
-    if current_edges:
-        edge_color_map = []
-        for edge in G.edges:
-            if tuple(edge) in [tuple(e) for e in current_edges] or tuple(edge[::-1]) in [tuple(e) for e in
-                                                                                         current_edges]:
-                edge_color_map.append('tab:red')
-            else:
-                edge_color_map.append('black')
-
-        nx.draw_networkx_edges(G, pos, edge_color=edge_color_map, width=width)
-    else:
-        nx.draw_networkx_edges(G, pos, edge_color=default_color, width=width)
+    if G.has_labels:
+        for (x, y), label in zip(pos[detail.nodes], G.labels[detail.nodes]):
+            ax.annotate(label, (x, y), xytext=(0, -LABEL_OFFSET), textcoords='offset points', ha='center',
+                        va='center', fontsize=12, color=default_color, zorder=3)
 
     # Draw Distances
-    if distances is not None and not distances["Cost"].empty:
-        distance_labels = distances["Cost"].replace(float('inf'), '∞').apply(
-            lambda x: int(x) if isinstance(x, float) else x)
-
-        label_pos = {node: (coords[0], coords[1] + 0.13) for node, coords in pos.items()}
-        # Ensure the node exists in pos before drawing the label
-        distance_labels = {node: label for node, label in distance_labels.items() if node in pos}
-        nx.draw_networkx_labels(G, label_pos, distance_labels, font_color=default_color)
+    if distances is not None and len(distances) == len(G):
+        for (x, y), cost in zip(pos[detail.nodes], distances[detail.nodes].tolist()):
+            ax.annotate(format_number(cost), (x, y), xytext=(0, LABEL_OFFSET), textcoords='offset points',
+                        ha='center', va='center', fontsize=12, color=default_color, zorder=3)
 
     if not final_step:
         # Draw weights
-        edge_labels = nx.get_edge_attributes(G, 'weight')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels)
+        midpoints = (pos[u[detail.edges]] + pos[v[detail.edges]]) / 2
+        for (x, y), weight in zip(midpoints, w[detail.edges].tolist()):
+            ax.text(x, y, format_number(weight), ha='center', va='center', fontsize=10, zorder=3,
+                    bbox=dict(boxstyle='round', ec=(1.0, 1.0, 1.0), fc=(1.0, 1.0, 1.0)))
+    ax.set_xlim(view[0], view[1])
+    ax.set_ylim(view[2], view[3])
     plt.axis('off')
@@ -0,0 +1,79 @@
+class IndexedHeap:
+    """Binary min-heap over the node indices ``0..n-1`` with decrease-key.
+
+    Every node is in the heap at most once, ``position`` tells where, so lowering its key moves the entry up
+    instead of pushing a duplicate. Ties are broken by the lower index, the same order as ``heapq`` on
+    ``(key, index)`` tuples.
+    """
+
+    __slots__ = ("keys", "heap", "position")
+
+    def __init__(self, n):
+        self.keys = [float("inf")] * n
+        self.heap = []
+        self.position = [-1] * n
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, node):
+        return self.position[node] >= 0
+
+    def push(self, node, key):
+        """Insert ``node`` or lower its key, a higher key than the current one is ignored."""
+        if self.position[node] < 0:
+            self.keys[node] = key
+            self.heap.append(node)
+            self.position[node] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+        elif key < self.keys[node]:
+            self.keys[node] = key
+            self._sift_up(self.position[node])
+
+    def pop(self):
+        heap = self.heap
+        node = heap[0]
+        last = heap.pop()
+        self.position[node] = -1
+        if heap:
+            heap[0] = last
+            self.position[last] = 0
+            self._sift_down(0)
+        return self.keys[node], node
+
+    def _sift_up(self, i):
+        heap, position, keys = self.heap, self.position, self.keys
+        node = heap[i]
+        key = keys[node]
+        while i > 0:
+            parent = (i - 1) >> 1
+            other = heap[parent]
+            if keys[other] < key or (keys[other] == key and other < node):
+                break
+            heap[i] = other
+            position[other] = i
+            i = parent
+        heap[i] = node
+        position[node] = i
+
+    def _sift_down(self, i):
+        heap, position, keys = self.heap, self.position, self.keys
+        size = len(heap)
+        node = heap[i]
+        key = keys[node]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            child_node = heap[child]
+            if child + 1 < size:
+                right = heap[child + 1]
+                if keys[right] < keys[child_node] or (keys[right] == keys[child_node] and right < child_node):
+                    child, child_node = child + 1, right
+            if key < keys[child_node] or (key == keys[child_node] and node < child_node):
+                break
+            heap[i] = child_node
+            position[child_node] = i
+            i = child
+        heap[i] = node
+        position[node] = i
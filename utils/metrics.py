@@ -0,0 +1,79 @@
+import functools
+import inspect
+import os
+import threading
+import time
+
+# Set DIJKSTRA_METRICS=1 to time the hot paths and serve them on /metrics. When it is off ``timed`` returns the
+# function it decorates unchanged, so nothing is measured and nothing is paid for.
+METRICS_ENABLED = os.environ.get("DIJKSTRA_METRICS", "0") == "1"
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+
+class SpanMetrics:
+    """Count, total and histogram of the durations of every named span."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = [0, 0.0, [0] * len(self.buckets)]
+            span[0] += 1
+            span[1] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    span[2][i] += 1
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            spans = {name: (count, total, list(buckets)) for name, (count, total, buckets) in self._spans.items()}
+        lines = ["# HELP dijkstra_span_seconds Time spent in instrumented functions.",
+                 "# TYPE dijkstra_span_seconds histogram"]
+        for name, (count, total, buckets) in sorted(spans.items()):
+            for bound, cumulative in zip(self.buckets, buckets):
+                lines.append(f'dijkstra_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'dijkstra_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'dijkstra_span_seconds_sum{{span="{name}"}} {total}')
+            lines.append(f'dijkstra_span_seconds_count{{span="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+span_metrics = SpanMetrics()
+
+
+def timed(name):
+    """Record every call of the decorated function as span ``name``, its count is how often it ran."""
+    def decorator(function):
+        if not METRICS_ENABLED:
+            return function
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                began = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    span_metrics.observe(name, time.perf_counter() - began)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                span_metrics.observe(name, time.perf_counter() - began)
+        return wrapper
+    return decorator
+
+
+def metrics_endpoint(request):
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(span_metrics.render(), media_type="text/plain; version=0.0.4")
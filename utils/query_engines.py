@@ -0,0 +1,254 @@
+import heapq
+from collections import namedtuple
+
+import networkx as nx
+import numpy as np
+from scipy.sparse.csgraph import dijkstra as scipy_dijkstra
+
+from utils.contraction_hierarchy import contraction_hierarchy
+from utils.csr_graph import CSRGraph
+from utils.dynamic_sssp import edge_changes, repair_tree
+from utils.lru_cache import LRUCache
+
+# path is a list of node ids, settled is the number of nodes the query had to settle
+PathResult = namedtuple("PathResult", ["path", "cost", "settled"])
+
+LANDMARK_COUNT = 8
+
+landmark_cache = LRUCache(max_bytes=256 * 1024 * 1024)
+# Full single source trees keyed by (graph fingerprint, start), a new graph simply gets new keys
+# and the trees of the old one age out.
+tree_cache = LRUCache(max_bytes=128 * 1024 * 1024)
+
+
+def dijkstra_query(G: CSRGraph, source, goal):
+    offsets, targets, weights = G.offsets, G.targets, G.weights
+    cost = np.full(len(G), np.inf)
+    previous = np.full(len(G), -1, dtype=np.int64)
+    visited = np.zeros(len(G), dtype=bool)
+    settled = 0
+    cost[source] = 0
+    heap = [(0, source)]
+    while heap:
+        node_cost, node = heapq.heappop(heap)
+        if visited[node]:
+            continue
+        visited[node] = True
+        settled += 1
+        if node == goal:
+            break
+        for neighbor, weight in zip(targets[offsets[node]:offsets[node + 1]].tolist(),
+                                    weights[offsets[node]:offsets[node + 1]].tolist()):
+            new_cost = node_cost + weight
+            if new_cost < cost[neighbor]:
+                cost[neighbor] = new_cost
+                previous[neighbor] = node
+                heapq.heappush(heap, (new_cost, neighbor))
+
+    if not visited[goal]:
+        return None, np.inf, settled
+    return _unwind(previous, source, goal), cost[goal], settled
+
+
+def bidirectional_query(G: CSRGraph, source, goal):
+    if source == goal:
+        return [source], 0, 1
+    offsets, targets, weights = G.offsets, G.targets, G.weights
+    cost = [np.full(len(G), np.inf), np.full(len(G), np.inf)]
+    previous = [np.full(len(G), -1, dtype=np.int64), np.full(len(G), -1, dtype=np.int64)]
+    visited = [np.zeros(len(G), dtype=bool), np.zeros(len(G), dtype=bool)]
+    heaps = [[(0, source)], [(0, goal)]]
+    cost[0][source] = cost[1][goal] = 0
+    best, meeting, settled = np.inf, -1, 0
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        # Always grow the smaller frontier, the graph is undirected so both directions use the same arrays.
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        node_cost, node = heapq.heappop(heaps[side])
+        if visited[side][node]:
+            continue
+        visited[side][node] = True
+        settled += 1
+        for neighbor, weight in zip(targets[offsets[node]:offsets[node + 1]].tolist(),
+                                    weights[offsets[node]:offsets[node + 1]].tolist()):
+            new_cost = node_cost + weight
+            if new_cost < cost[side][neighbor]:
+                cost[side][neighbor] = new_cost
+                previous[side][neighbor] = node
+                heapq.heappush(heaps[side], (new_cost, neighbor))
+            total = new_cost + cost[1 - side][neighbor]
+            if total < best:
+                best, meeting = total, neighbor
+
+    if meeting < 0:
+        return None, np.inf, settled
+    forward = _unwind(previous[0], source, meeting)
+    backward = _unwind(previous[1], goal, meeting)
+    return forward + backward[-2::-1], best, settled
+
+
+class LandmarkIndex:
+    """Distances from a few far apart landmarks to every node, used as A* lower bounds (ALT)."""
+
+    def __init__(self, G: CSRGraph, count=LANDMARK_COUNT, seed=0):
+        matrix = G.adjacency_matrix()
+        count = min(count, len(G))
+        rng = np.random.default_rng(seed)
+        landmarks = [int(rng.integers(len(G)))]
+        distances = [scipy_dijkstra(matrix, directed=False, indices=landmarks[0])]
+        closest = distances[0].copy()
+        while len(landmarks) < count:
+            reachable = np.where(np.isfinite(closest), closest, -1)
+            candidate = int(np.argmax(reachable))
+            if reachable[candidate] <= 0:
+                break
+            landmarks.append(candidate)
+            distances.append(scipy_dijkstra(matrix, directed=False, indices=candidate))
+            closest = np.minimum(closest, distances[-1])
+        self.landmarks = np.array(landmarks, dtype=np.int64)
+        self.distances = np.vstack(distances)
+
+    @property
+    def nbytes(self):
+        return self.landmarks.nbytes + self.distances.nbytes
+
+    def heuristic(self, goal):
+        """Triangle inequality lower bound of the distance from every node to ``goal``."""
+        to_goal = self.distances[:, goal][:, None]
+        with np.errstate(invalid="ignore"):
+            bound = np.abs(to_goal - self.distances)
+        bound[~np.isfinite(bound)] = 0
+        return bound.max(axis=0)
+
+
+def landmark_index(G: CSRGraph):
+    return landmark_cache.get_or_compute(G.fingerprint(), lambda: LandmarkIndex(G))
+
+
+def alt_query(G: CSRGraph, source, goal):
+    h = landmark_index(G).heuristic(goal)
+    offsets, targets, weights = G.offsets, G.targets, G.weights
+    cost = np.full(len(G), np.inf)
+    previous = np.full(len(G), -1, dtype=np.int64)
+    visited = np.zeros(len(G), dtype=bool)
+    settled = 0
+    cost[source] = 0
+    heap = [(h[source], source)]
+    while heap:
+        _, node = heapq.heappop(heap)
+        if visited[node]:
+            continue
+        visited[node] = True
+        settled += 1
+        if node == goal:
+            break
+        node_cost = cost[node]
+        for neighbor, weight in zip(targets[offsets[node]:offsets[node + 1]].tolist(),
+                                    weights[offsets[node]:offsets[node + 1]].tolist()):
+            new_cost = node_cost + weight
+            if new_cost < cost[neighbor]:
+                cost[neighbor] = new_cost
+                previous[neighbor] = node
+                heapq.heappush(heap, (new_cost + h[neighbor], neighbor))
+
+    if not visited[goal]:
+        return None, np.inf, settled
+    return _unwind(previous, source, goal), cost[goal], settled
+
+
+class ShortestPathTree:
+    """Distances and predecessors of every node for one start node.
+
+    A tree that was repaired from the tree of an edited graph knows the fingerprint of that graph and the
+    indices of the nodes whose distance or predecessor changed.
+    """
+
+    def __init__(self, G: CSRGraph, source, previous=None):
+        self.source = source
+        self.repaired_from = None
+        self.changed = None
+        if previous is not None:
+            previous_graph, previous_tree = previous
+            changes = edge_changes(previous_graph, G)
+            if changes is not None:
+                self.distances, self.predecessors, self.changed = repair_tree(
+                    G, source, previous_tree.distances, previous_tree.predecessors, changes)
+                self.repaired_from = previous_graph.fingerprint()
+                self.settled = len(self.changed)
+                return
+        self.distances, self.predecessors = scipy_dijkstra(G.adjacency_matrix(), directed=False, indices=source,
+                                                           return_predecessors=True)
+        self.settled = int(np.isfinite(self.distances).sum())
+
+    @property
+    def nbytes(self):
+        return self.distances.nbytes + self.predecessors.nbytes + (self.changed.nbytes if self.changed is not None else 0)
+
+    def path_to(self, goal):
+        if not np.isfinite(self.distances[goal]):
+            return None
+        path = [goal]
+        while path[-1] != self.source:
+            path.append(int(self.predecessors[path[-1]]))
+        return path[::-1]
+
+
+def shortest_path_tree(G: CSRGraph, source, previous_graph: CSRGraph = None):
+    """Cached tree of ``source``. When ``G`` was edited from ``previous_graph`` and its tree is cached, only the
+    part of that tree the edit affects is computed again."""
+    def compute():
+        previous_tree = tree_cache.get((previous_graph.fingerprint(), source)) if previous_graph is not None else None
+        return ShortestPathTree(G, source, (previous_graph, previous_tree) if previous_tree is not None else None)
+    return tree_cache.get_or_compute((G.fingerprint(), source), compute)
+
+
+def tree_query(G: CSRGraph, source, goal):
+    tree = tree_cache.get((G.fingerprint(), source))
+    if tree is not None:
+        # Every target of an already explored start is a walk up its tree, nothing has to be settled
+        return tree.path_to(goal), tree.distances[goal], 0
+    tree = shortest_path_tree(G, source)
+    return tree.path_to(goal), tree.distances[goal], tree.settled
+
+
+def ch_query(G: CSRGraph, source, goal):
+    hierarchy = contraction_hierarchy(G)
+    if hierarchy is None:
+        # Still being built in the background, answer this query without it
+        return bidirectional_query(G, source, goal)
+    return hierarchy.query(source, goal)
+
+
+QUERY_ENGINES = {
+    "dijkstra": dijkstra_query,
+    "bidirectional": bidirectional_query,
+    "alt": alt_query,
+    "ch": ch_query,
+    "tree": tree_query,
+}
+
+
+def shortest_path_query(G: CSRGraph, start, target, engine="dijkstra"):
+    source, goal = G.index_of(start), G.index_of(target)
+    path, cost, settled = QUERY_ENGINES[engine](G, source, goal)
+    if path is None:
+        raise nx.NetworkXNoPath(f"Node {target} not reachable from {start}")
+    return PathResult([G.node_at(node) for node in path], cost.item() if hasattr(cost, "item") else cost, settled)
+
+
+def path_cost(G: CSRGraph, path):
+    """Total weight of ``path`` (node ids) or None if two consecutive nodes are not connected."""
+    try:
+        indices = [G.index_of(node) for node in path]
+        return sum(G.edge_weight(a, b) for a, b in zip(indices, indices[1:])).item() if len(path) > 1 else 0
+    except KeyError:
+        return None
+
+
+def _unwind(previous, source, node):
+    path = [node]
+    while path[-1] != source:
+        path.append(int(previous[path[-1]]))
+    return path[::-1]
@@ -0,0 +1,95 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from utils.csr_graph import CSRGraph
+
+# Every generator takes a seed and draws everything from one np.random.Generator, so the same parameters and
+# seed always give the same graph. Edges and weights are drawn as whole arrays and go straight into a CSRGraph.
+MAX_WEIGHT = 100
+
+
+def random_weights(rng, count, low=1, high=MAX_WEIGHT):
+    return rng.integers(low, high + 1, count, dtype=np.int64)
+
+
+def grid_graph(rows, cols, seed=0, low=1, high=MAX_WEIGHT):
+    """``rows`` x ``cols`` lattice, node ``r * cols + c`` is connected to its right and lower neighbour."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+    u = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    v = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    positions = np.stack([np.tile(np.arange(cols), rows), -np.repeat(np.arange(rows), cols)], axis=1)
+    return CSRGraph.from_edges(u, v, random_weights(rng, len(u), low, high), nodes=ids.ravel(), positions=positions)
+
+
+def watts_strogatz_graph(n, k, p, seed=0):
+    """Ring lattice where every node is joined to its ``k // 2`` next nodes and each edge is rewired with
+    probability ``p``. The ring edges ``i - i+1`` are never rewired, which keeps the graph connected."""
+    rng = np.random.default_rng(seed)
+    nodes = np.arange(n, dtype=np.int64)
+    u = np.repeat(nodes, max(k // 2, 1))
+    v = (u + np.tile(np.arange(1, max(k // 2, 1) + 1), n)) % n
+    rewire = (rng.random(len(u)) < p) & (v != (u + 1) % n)
+    v[rewire] = rng.integers(0, n, int(rewire.sum()))
+    return CSRGraph.from_edges(u, v, random_weights(rng, len(u)), nodes=nodes)
+
+
+def geometric_graph(n, neighbors=4, seed=0, scale=1000):
+    """Road like graph: random points in the unit square joined to their ``neighbors`` nearest points.
+
+    Weights are the euclidean lengths times ``scale``. Smaller components are joined to the largest one
+    by an edge to their closest point in it.
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.random((n, 2))
+    # Number the points cell by cell so neighbours get close ids, the nearest neighbour queries and later
+    # searches on the CSR arrays then walk memory mostly in order.
+    cells = int(np.sqrt(n)) + 1
+    points = points[np.lexsort(((points[:, 1] * cells).astype(np.int64), (points[:, 0] * cells).astype(np.int64)))]
+    tree = cKDTree(points)
+    _, nearest = tree.query(points, k=min(neighbors, n - 1) + 1)
+    u = np.repeat(np.arange(n, dtype=np.int64), nearest.shape[1] - 1)
+    v = nearest[:, 1:].ravel().astype(np.int64)
+
+    count, labels = connected_components(csr_matrix((np.ones(len(u)), (u, v)), shape=(n, n)), directed=False)
+    if count > 1:
+        largest = np.argmax(np.bincount(labels))
+        inside = np.flatnonzero(labels == largest)
+        # One representative per other component, linked to the closest point of the largest component
+        outside = np.flatnonzero(labels != largest)
+        _, first = np.unique(labels[outside], return_index=True)
+        representatives = outside[first]
+        _, closest = cKDTree(points[inside]).query(points[representatives])
+        u = np.concatenate([u, representatives])
+        v = np.concatenate([v, inside[closest]])
+
+    lengths = np.linalg.norm(points[u] - points[v], axis=1)
+    weights = np.maximum(np.rint(lengths * scale), 1).astype(np.int64)
+    return CSRGraph.from_edges(u, v, weights, nodes=np.arange(n, dtype=np.int64), positions=points)
+
+
+def power_law_graph(n, average_degree=4, exponent=2.5, seed=0):
+    """Chung-Lu graph whose expected degrees follow a power law with the given ``exponent``.
+
+    A random recursive tree (node ``i`` joined to a random earlier node) is laid underneath so the graph
+    is always connected.
+    """
+    rng = np.random.default_rng(seed)
+    expected = np.arange(1, n + 1, dtype=np.float64) ** (-1 / (exponent - 1))
+    cumulative = np.cumsum(expected / expected.sum())
+    extra = max(n * average_degree // 2 - (n - 1), 0)
+    tree_u = np.arange(1, n, dtype=np.int64)
+    tree_v = (rng.random(n - 1) * tree_u).astype(np.int64)
+    u = np.concatenate([tree_u, _sample(rng, cumulative, extra)])
+    v = np.concatenate([tree_v, _sample(rng, cumulative, extra)[rng.permutation(extra)]])
+    return CSRGraph.from_edges(u, v, random_weights(rng, len(u)), nodes=np.arange(n, dtype=np.int64))
+
+
+def _sample(rng, cumulative, count):
+    """``count`` draws from the distribution with the ``cumulative`` probabilities, in ascending order.
+
+    Searching sorted uniforms walks the cumulative array once, which is much faster than ``rng.choice``.
+    """
+    return np.searchsorted(cumulative, np.sort(rng.random(count)) * cumulative[-1], side="right").astype(np.int64)
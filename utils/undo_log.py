@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class UndoLog:
+    """Undo stack of walkthrough states that only keeps what every step changed.
+
+    States are dicts and are pushed before a step changes them. When the caller passes the indices the step is
+    going to change in the NumPy array values, only the values at those indices are kept, otherwise the arrays
+    are copied as a checkpoint. ``pop`` writes the kept values back into the arrays of the current state, so
+    neither push nor pop touches the rest of the arrays. List values are kept as the part that differs from the
+    next state and everything else as is. Once the log uses more than ``max_bytes`` the oldest entries are dropped.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = []
+        self._sizes = []
+        self._nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def push(self, state, touched=None):
+        entry = {}
+        for key, value in state.items():
+            if isinstance(value, np.ndarray):
+                entry[key] = ("array", value.copy()) if touched is None else ("items", touched, value[touched])
+            elif isinstance(value, list):
+                entry[key] = ("list", value)
+            else:
+                entry[key] = ("value", value)
+        if self._entries:
+            self._shorten_lists(state)
+        self._entries.append(entry)
+        self._sizes.append(_size(entry))
+        self._nbytes += self._sizes[-1]
+
+        while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+            del self._entries[0]
+            self._nbytes -= self._sizes.pop(0)
+
+    def pop(self, state):
+        """The state of the last ``push``, its arrays are the ones of the current ``state`` changed back."""
+        if not self._entries:
+            return None
+        entry = self._entries.pop()
+        self._nbytes -= self._sizes.pop()
+        restored = {}
+        for key, change in entry.items():
+            if change[0] == "items":
+                array = state[key]
+                array[change[1]] = change[2]
+                restored[key] = array
+            elif change[0] == "tail":
+                restored[key] = state[key][:change[1]] + change[2]
+            else:
+                restored[key] = change[1]
+        return restored
+
+    def _shorten_lists(self, state):
+        """Keep the lists of the last entry as what they have in addition to the lists of ``state``."""
+        entry = self._entries[-1]
+        for key, change in entry.items():
+            if change[0] == "list" and isinstance(state.get(key), list):
+                prefix = _common_prefix(change[1], state[key])
+                entry[key] = ("tail", prefix, change[1][prefix:])
+        self._nbytes -= self._sizes[-1]
+        self._sizes[-1] = _size(entry)
+        self._nbytes += self._sizes[-1]
+
+
+def _common_prefix(old, new):
+    # The lists of the walkthrough mostly grow at the end, that case is one comparison of two slices
+    if len(old) <= len(new) and new[:len(old)] == old:
+        return len(old)
+    prefix = 0
+    for a, b in zip(old, new):
+        if a != b:
+            break
+        prefix += 1
+    return prefix
+
+
+def _size(entry):
+    size = 0
+    for change in entry.values():
+        if change[0] == "array":
+            size += change[1].nbytes
+        elif change[0] == "items":
+            size += change[1].nbytes + change[2].nbytes
+        elif change[0] in ("list", "tail"):
+            size += 8 * len(change[-1])
+        else:
+            size += 8
+    return size